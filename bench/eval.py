@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+'''
+Eval benchmark of computed sensors:
+evaluations per second of eval code with a new asteval Interpreter per call
+(as before the eval engine) and with the pooled EvalEngine,
+results and reported errors of both ways are compared first
+(EvalEngine relies on internals of asteval)
+
+usage: python bench/eval.py [-n EVALS]
+'''
+
+import sys
+import re
+import time
+import logging
+import argparse
+from asteval import Interpreter, make_symbol_table
+
+CODE = 'value * 1.01 + 0.5 if value > 0 else prev_value'
+FAILING_CODES = ['value / 0', 'unknown_var + 1', 'value +* 2', 'int("x")']
+
+
+def get_symbols(i):
+    return {
+        'value': 20.0 + i % 10,
+        'prev_value': 19.5,
+        'hits_total': i,
+        'hit_timestamp': 1700000000.0 + i,
+        'duration_seconds': 1.0,
+        'origin': [],
+    }
+
+
+class Devnull():
+    '''writer that drops all output of evaluated code'''
+    def write(self, *_):
+        pass
+
+
+def eval_interpreter(code, symbols):
+    '''evaluate code with a new interpreter, return (result, list of errors)'''
+
+    symtable = make_symbol_table(use_numpy=True, re=re, **symbols)
+    aeval = Interpreter(writer=Devnull(), err_writer=Devnull(), symtable=symtable)
+    result = aeval.eval(code)
+    return result, aeval.error
+
+
+def get_errors(errors):
+    return [err.get_error() for err in errors]
+
+
+def check(engine):
+    '''compare results and errors of the engine with a new interpreter'''
+
+    ok = True
+    for code in [CODE] + FAILING_CODES:
+        (result, errors) = eval_interpreter(code, get_symbols(1))
+        (engine_result, engine_errors) = engine.eval(code, get_symbols(1))
+        if result != engine_result or get_errors(errors) != get_errors(engine_errors):
+            print(f"{code!r}: interpreter {result!r} {get_errors(errors)}, "
+                  f"engine {engine_result!r} {get_errors(engine_errors)}")
+            ok = False
+    return ok
+
+
+def bench(evals, engine):
+    rates = {}
+
+    start_t = time.perf_counter()
+    for i in range(evals):
+        eval_interpreter(CODE, get_symbols(i))
+    rates['interpreter per call'] = evals / (time.perf_counter() - start_t)
+
+    engine.compile(CODE)
+    start_t = time.perf_counter()
+    for i in range(evals):
+        engine.eval(CODE, get_symbols(i))
+    rates['EvalEngine'] = evals / (time.perf_counter() - start_t)
+
+    for name, rate in rates.items():
+        print(f"{name:20s} {rate:8.0f} evals/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='eval benchmark')
+    parser.add_argument('-n', '--evals', type=int, default=20000)
+    args = parser.parse_args()
+
+    # laporte parses command line arguments on import
+    sys.argv = [sys.argv[0], '-l', 'ERROR']
+    logging.disable(logging.CRITICAL)
+    # pylint: disable=import-outside-toplevel
+    from laporte.core.evaluator import EvalEngine
+
+    engine = EvalEngine()
+    if not check(engine):
+        print("EvalEngine differs from asteval Interpreter")
+    bench(args.evals, engine)
+
+
+if __name__ == '__main__':
+    main()
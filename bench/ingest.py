@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+'''
+Ingestion throughput benchmark:
+requests per second of a node update via the form based API (/api/metrics)
+and via the lean ingestion API with JSON and MessagePack bodies (/api/ingest),
+requests are passed to the WSGI app in process
+
+usage: python bench/ingest.py [-s SENSORS] [-n REQUESTS]
+'''
+
+import sys
+import os
+import io
+import json
+import time
+import logging
+import tempfile
+import argparse
+import statistics
+from urllib.parse import urlencode
+import msgpack
+import yaml
+
+NODE_ID = 'node1'
+ROUNDS = 5
+
+
+def write_config(path, sensors_count):
+    sensors = {f's{i}': {'type': 'gauge'} for i in range(sensors_count)}
+    config = {'gw': {NODE_ID: {'sensors': sensors}}}
+    with open(path, 'w', encoding='utf-8') as config_file:
+        yaml.safe_dump(config, config_file)
+
+
+def get_values(i, sensors_count):
+    return {f's{j}': round(20 + (i + j) % 97 / 10, 2) for j in range(sensors_count)}
+
+
+def bench(sensors_count, requests_count):
+    # pylint: disable=import-outside-toplevel
+    from werkzeug.test import EnvironBuilder
+    from laporte.argparser import pars
+    from laporte.app import app
+    from laporte.core import sensors
+    sensors.load_config(pars)
+    # the form parser of the API is built from loaded config
+    from laporte.api import api_bp
+    from laporte.api.ingest import ingest_bp
+    app.register_blueprint(api_bp)
+    app.register_blueprint(ingest_bp)
+
+    def start_response(status, _):
+        assert status[:3] in ('200', '204'), status
+
+    def run(path, encode, content_type):
+        environs = []
+        for i in range(requests_count):
+            environ = EnvironBuilder(path=path,
+                                     method='PUT',
+                                     data=encode(get_values(i, sensors_count)),
+                                     content_type=content_type).get_environ()
+            environ['wsgi.input'] = io.BytesIO(environ['wsgi.input'].read())
+            environs.append(environ)
+
+        start_t = time.perf_counter()
+        for environ in environs:
+            for _ in app(environ, start_response):
+                pass
+        return requests_count / (time.perf_counter() - start_t)
+
+    cases = {
+        'form /api/metrics': (f'/api/metrics/{NODE_ID}',
+                              lambda values: urlencode(values).encode(),
+                              'application/x-www-form-urlencoded'),
+        'json /api/ingest': (f'/api/ingest/{NODE_ID}',
+                             lambda values: json.dumps(values).encode(),
+                             'application/json'),
+        'msgpack /api/ingest': (f'/api/ingest/{NODE_ID}',
+                                msgpack.packb,
+                                'application/msgpack'),
+    }
+    results = {name: [] for name in cases}
+    for _ in range(ROUNDS):
+        for name, case in cases.items():
+            results[name].append(run(*case))
+
+    for name, rates in results.items():
+        rate = statistics.median(rates)
+        print(f"{sensors_count} sensors {name:20s} {rate:7.0f} req/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='ingestion throughput benchmark')
+    parser.add_argument('-s', '--sensors', type=int, default=20)
+    parser.add_argument('-n', '--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        config_file = os.path.join(tmp_dir, 'ingest.yml')
+        write_config(config_file, args.sensors)
+        # laporte parses command line arguments on import
+        sys.argv = [sys.argv[0], '-c', config_file, '-l', 'ERROR']
+        bench(args.sensors, args.requests)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+'''
+Logging hot path benchmark:
+cost of a logging.info call with an event ID (emitted to Socket.IO) when
+handlers are called directly in the logging call (as before the batched
+pipeline) and when records are only enqueued and handled in batches,
+with a number of connected clients of the /logs namespace (test clients)
+
+(not named logging.py, it would shadow the logging module when run)
+
+usage: python bench/log_pipeline.py [-c CLIENTS ...] [-n RECORDS]
+'''
+
+import sys
+import os
+import time
+import logging
+import argparse
+import statistics
+
+ROUNDS = 5
+
+
+def bench(clients_count, records_count, direct):
+    # pylint: disable=import-outside-toplevel
+    from laporte.app import app, sio, event_id
+    from laporte.logger import cl
+
+    root = logging.getLogger()
+    queue_handler = cl.queue_handler
+    if direct:
+        root.handlers = list(queue_handler.handlers)
+    else:
+        root.handlers = [queue_handler]
+
+    clients = [sio.test_client(app, namespace='/logs') for _ in range(clients_count)]
+    data = {'temp': 21.5, 'hum': 0.5, 'nested': {'a': 1}}
+    hot = []
+    total = []
+    for _ in range(ROUNDS):
+        with app.app_context():
+            event_id.set(add_prefix='bench_')
+            start_t = time.perf_counter()
+            for _ in range(records_count):
+                logging.info('nodes update event: %s', data)
+            hot_t = time.perf_counter()
+            queue_handler.flush()
+            end_t = time.perf_counter()
+            event_id.release()
+        hot.append((hot_t - start_t) / records_count * 1e6)
+        total.append((end_t - start_t) / records_count * 1e6)
+        for client in clients:
+            client.get_received('/logs')
+
+    for client in clients:
+        client.disconnect(namespace='/logs')
+    root.handlers = [queue_handler]
+
+    print(f"{clients_count} clients {'direct ' if direct else 'batched'}: "
+          f"hot path {statistics.median(hot):7.2f} us/record, "
+          f"incl. flush {statistics.median(total):7.2f} us/record",
+          file=sys.__stdout__)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='logging hot path benchmark')
+    parser.add_argument('-c', '--clients', nargs='*', type=int, default=[0, 5])
+    parser.add_argument('-n', '--records', type=int, default=2000)
+    args = parser.parse_args()
+
+    # laporte parses command line arguments on import,
+    # console output of the logs goes nowhere
+    sys.argv = [sys.argv[0], '-l', 'INFO']
+    with open(os.devnull, 'w', encoding='utf-8') as devnull:
+        sys.stderr = devnull
+        for clients_count in args.clients:
+            for direct in (True, False):
+                bench(clients_count, args.records, direct)
+        sys.stderr = sys.__stderr__
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+'''
+Memory benchmark of sensors:
+memory per sensor (tracemalloc) of sensors loaded from config and of sensors
+cloned from a template (binary sensor with eval, gauge with debounce and labels)
+
+usage: python bench/memory.py [SENSORS]   (default 100000)
+'''
+
+import sys
+import os
+import gc
+import types
+import logging
+import tempfile
+import argparse
+import tracemalloc
+import yaml
+
+
+class NullSio():
+    '''Socket.IO server dropping all emits'''
+    def emit(self, *_, **__):
+        pass
+
+
+def get_node_config():
+    return {
+        'export': {
+            'labels': {
+                'site': 'home'
+            }
+        },
+        'sensors': {
+            't': {
+                'type': 'gauge',
+                'debounce': {
+                    'changed': True
+                }
+            },
+            'h': {
+                'type': 'binary',
+                'eval': {
+                    'require': {
+                        'x': ['t', 'value']
+                    },
+                    'code': 'x > 1'
+                }
+            }
+        }
+    }
+
+
+def write_config(path, sensors_count):
+    nodes = {f'n{i}': get_node_config() for i in range(sensors_count // 2)}
+    config = {'gw': nodes, 'gw2': {1: get_node_config()}}
+    with open(path, 'w', encoding='utf-8') as config_file:
+        yaml.safe_dump(config, config_file)
+
+
+def bench(sensors_count, tmp_dir):
+    # pylint: disable=import-outside-toplevel
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from laporte.app import app
+    from laporte.core.sensors import Sensors
+
+    config_file = os.path.join(tmp_dir, 'memory.yml')
+    write_config(config_file, sensors_count)
+    sensors = Sensors(app, NullSio(), BackgroundScheduler())
+
+    gc.collect()
+    tracemalloc.start()
+    with app.app_context():
+        sensors.load_config(
+            types.SimpleNamespace(config_file=config_file,
+                                  config_jinja=False,
+                                  config_dir=tmp_dir))
+    gc.collect()
+    config_size = tracemalloc.get_traced_memory()[0]
+
+    with app.app_context():
+        for i in range(sensors_count // 2):
+            sensors.set_node_values(f'tpl{i}', {'t': 1})
+    gc.collect()
+    clones_size = tracemalloc.get_traced_memory()[0] - config_size
+    tracemalloc.stop()
+
+    print(f"{sensors_count} config sensors: {config_size / 1e6:.1f} MB "
+          f"({config_size / sensors_count:.0f} B/sensor)")
+    print(f"{sensors_count} template clones: {clones_size / 1e6:.1f} MB "
+          f"({clones_size / sensors_count:.0f} B/sensor)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='memory benchmark of sensors')
+    parser.add_argument('sensors', nargs='?', type=int, default=100000)
+    args = parser.parse_args()
+
+    # laporte parses command line arguments on import
+    sys.argv = [sys.argv[0], '-l', 'ERROR']
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bench(args.sensors, tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
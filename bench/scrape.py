@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+'''
+Scrape benchmark of the collector of sensor metrics:
+time and peak memory (tracemalloc) of one collect with the dict and streaming
+export modes at given numbers of sensors (gauge + counter per node)
+
+usage: python bench/scrape.py [SENSORS ...]   (default 1000 10000 100000)
+'''
+
+import sys
+import os
+import types
+import time
+import logging
+import tempfile
+import argparse
+import tracemalloc
+import yaml
+
+
+class NullSio():
+    '''Socket.IO server dropping all emits'''
+    def emit(self, *_, **__):
+        pass
+
+
+def write_config(path, sensors_count):
+    nodes = {}
+    for i in range(sensors_count // 2):
+        nodes[f'n{i}'] = {'sensors': {'t': {'type': 'gauge'}, 'h': {'type': 'counter'}}}
+    config = {'gw': nodes}
+    with open(path, 'w', encoding='utf-8') as config_file:
+        yaml.safe_dump(config, config_file)
+
+
+def bench(sensors_count, tmp_dir):
+    # pylint: disable=import-outside-toplevel
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from prometheus_client import generate_latest
+    from laporte.app import app
+    from laporte.core.sensors import Sensors
+    from laporte.metrics import metrics
+    from laporte.metrics.collector import CustomCollector
+
+    config_file = os.path.join(tmp_dir, f'scrape{sensors_count}.yml')
+    write_config(config_file, sensors_count)
+    sensors = Sensors(app, NullSio(), BackgroundScheduler())
+    with app.app_context():
+        sensors.load_config(
+            types.SimpleNamespace(config_file=config_file,
+                                  config_jinja=False,
+                                  config_dir=tmp_dir))
+        sensors.set_nodes_values(
+            {f'n{i}': {'t': i, 'h': i}
+             for i in range(sensors_count // 2)})
+
+    outputs = {}
+    for streaming in (False, True):
+        collector = CustomCollector(metrics, sensors, streaming=streaming)
+        list(collector.collect())  # warm up (index of the streaming mode)
+
+        tracemalloc.start()
+        start_t = time.perf_counter()
+        for _ in collector.collect():
+            pass
+        duration = time.perf_counter() - start_t
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        outputs[streaming] = sorted(generate_latest(collector).splitlines())
+        print(f"{sensors_count:>7} sensors {'stream' if streaming else 'dict  '}: "
+              f"collect {duration * 1000:8.1f} ms, peak {peak / 1e6:7.2f} MB")
+
+    if outputs[False] != outputs[True]:
+        print("outputs of the export modes differ")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='scrape benchmark')
+    parser.add_argument('sensors', nargs='*', type=int, default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    # laporte parses command line arguments on import
+    sys.argv = [sys.argv[0], '-l', 'ERROR']
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for sensors_count in args.sensors:
+            bench(sensors_count, tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
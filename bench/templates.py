@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+'''
+Template instantiation benchmark:
+time to create nodes from a template (gauge with ttl, binary with eval,
+counter with cron and message, like conf/example_template.yml),
+one update of a new node each
+
+usage: python bench/templates.py [NODES]   (default 10000)
+'''
+
+import sys
+import os
+import time
+import types
+import logging
+import tempfile
+import argparse
+
+CONFIG = '''
+virtual:
+    1:
+        export:
+            labels:
+                site: home
+        sensors:
+            temp_celsius:
+                type: gauge
+                ttl: 60
+            frozen_state:
+                type: binary
+                eval:
+                    require:
+                        t : [ temp_celsius, value ]
+                    code: 't < 0'
+            heartbeat:
+                type: counter
+                cron:
+                    "*/5 * * * *": 1
+            msg:
+                type: message
+'''
+
+
+class NullSio():
+    '''Socket.IO server dropping all emits'''
+    def emit(self, *_, **__):
+        pass
+
+
+def bench(nodes_count, tmp_dir):
+    # pylint: disable=import-outside-toplevel
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from laporte.app import app
+    from laporte.core.sensors import Sensors
+
+    config_file = os.path.join(tmp_dir, 'templates.yml')
+    with open(config_file, 'w', encoding='utf-8') as stream:
+        stream.write(CONFIG)
+
+    scheduler = BackgroundScheduler()
+    scheduler.start()
+    sensors = Sensors(app, NullSio(), scheduler)
+    with app.app_context():
+        sensors.load_config(
+            types.SimpleNamespace(config_file=config_file,
+                                  config_jinja=False,
+                                  config_dir=tmp_dir))
+        start_t = time.perf_counter()
+        for i in range(nodes_count):
+            sensors.set_node_values(f'weather{i}', {'temp_celsius': -1.5})
+        duration = time.perf_counter() - start_t
+    scheduler.shutdown(wait=False)
+
+    print(f"{nodes_count} nodes from template: {duration:.2f} s "
+          f"({duration / nodes_count * 1e6:.0f} us/node), "
+          f"{len(sensors.sensor_index)} sensors")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='template instantiation benchmark')
+    parser.add_argument('nodes', nargs='?', type=int, default=10000)
+    args = parser.parse_args()
+
+    # laporte parses command line arguments on import
+    sys.argv = [sys.argv[0], '-l', 'ERROR']
+    logging.disable(logging.CRITICAL)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        bench(args.nodes, tmp_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -12,6 +12,8 @@ from laporte.app import event_id
 from laporte.metrics import metrics
 from laporte.metrics.common import http_duration_metric
 from laporte.core import sensors
+from laporte.logger import cl
+from laporte.api.views import ViewCache
 
 # create logger
 logging.getLogger(__name__).addHandler(logging.NullHandler())
@@ -19,6 +21,9 @@ logging.getLogger(__name__).addHandler(logging.NullHandler())
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 api = Api(api_bp, doc=False, title='Laporte API', version=__version__)
 
+# serialized views of metrics of all sensors
+views = ViewCache(sensors)
+
 # url prefix /api/metrics/...
 
 ns_metrics = api.namespace('metrics',
@@ -49,7 +54,7 @@ class NodeMetrics(Resource):
         '''set sensors of a node'''
 
         event_id.set(add_prefix='api_')
-        logging.info("node update request: %s: %s", node_id, str(request.form.to_dict()))
+        logging.info("node update request: %s: %s", node_id, request.form.to_dict())
         try:
             ret = sensors.set_node_values(node_id, request.form)
         except KeyError:
@@ -92,7 +97,7 @@ class IncNodeMetrics(Resource):
                           })
     def put(self, node_id):
         '''increment sensor values of a node'''
-        logging.info("API/inc: %s: %s", node_id, str(request.form.to_dict()))
+        logging.info("API/inc: %s: %s", node_id, request.form.to_dict())
         try:
             ret = sensors.set_node_values(node_id, request.form, increment=True)
         except KeyError:
@@ -131,6 +136,30 @@ class SensorMetrics(Resource):
 
 @ns_metrics.route('/')
 class SensorsMetricsList(Resource):
+    @api.response(200, 'Success')
+    @api.response(400, 'Invalid payload')
+    @metrics.func_measure(**http_duration_metric,
+                          labels={
+                              'method': 'put',
+                              'location': '/api/metrics'
+                          })
+    def put(self):
+        '''set sensors of many nodes given as JSON {node_id: {sensor_id: value}}'''
+
+        event_id.set(add_prefix='api_')
+        nodes = request.get_json(silent=True)
+        if not isinstance(nodes, dict) or not all(
+                isinstance(node_data, dict) for node_data in nodes.values()):
+            logging.warning("invalid nodes update request: %s", request.get_data())
+            abort(400)
+        logging.info("nodes update request: %s", nodes)
+        ret = sensors.set_nodes_values(nodes)
+        event_id.release()
+
+        return ret
+
+    @api.response(200, 'Success')
+    @api.response(304, 'Not modified')
     @metrics.func_measure(**http_duration_metric,
                           labels={
                               'method': 'get',
@@ -139,11 +168,13 @@ class SensorsMetricsList(Resource):
     def get(self):
         '''get a list of all metrics'''
 
-        return list(sensors.get_metrics(skip_None=False))
+        return views.response('list', lambda: list(sensors.get_metrics(skip_None=False)))
 
 
 @ns_metrics.route('/by_gw')
 class SensorsMetricsByGw(Resource):
+    @api.response(200, 'Success')
+    @api.response(304, 'Not modified')
     @metrics.func_measure(**http_duration_metric,
                           labels={
                               'method': 'get',
@@ -152,11 +183,14 @@ class SensorsMetricsByGw(Resource):
     def get(self):
         '''get all metrics sorted by gateway / node_id / sensor_id'''
 
-        return sensors.get_metrics_dict_by_gw(skip_None=False)
+        return views.response(
+            'by_gw', lambda: sensors.get_metrics_dict_by_gw(skip_None=False))
 
 
 @ns_metrics.route('/by_node')
 class SensorsMetricsByNode(Resource):
+    @api.response(200, 'Success')
+    @api.response(304, 'Not modified')
     @metrics.func_measure(**http_duration_metric,
                           labels={
                               'method': 'get',
@@ -165,11 +199,14 @@ class SensorsMetricsByNode(Resource):
     def get(self):
         '''get all metrics sorted by node_id / sensor_id'''
 
-        return sensors.get_metrics_dict_by_node(skip_None=False)
+        return views.response(
+            'by_node', lambda: sensors.get_metrics_dict_by_node(skip_None=False))
 
 
 @ns_metrics.route('/by_sensor')
 class SensorsMetricsBySensor(Resource):
+    @api.response(200, 'Success')
+    @api.response(304, 'Not modified')
     @metrics.func_measure(**http_duration_metric,
                           labels={
                               'method': 'get',
@@ -178,7 +215,8 @@ class SensorsMetricsBySensor(Resource):
     def get(self):
         '''get all metrics sorted by sensor_id'''
 
-        return sensors.get_metrics_dict_by_sensor(skip_None=False)
+        return views.response(
+            'by_sensor', lambda: sensors.get_metrics_dict_by_sensor(skip_None=False))
 
 
 # url prefix /api/state/...
@@ -243,6 +281,51 @@ class StateDump(Resource):
         return sensors.get_sensors_dump_dict()
 
 
+# url prefix /api/log/...
+
+ns_log = api.namespace('log',
+                       description='methods for logging configuration',
+                       path='/log')
+
+
+@ns_log.route('/levels')
+class LogLevels(Resource):
+    @metrics.func_measure(**http_duration_metric,
+                          labels={
+                              'method': 'get',
+                              'location': '/api/log/levels'
+                          })
+    def get(self):
+        '''get the default log level and log levels of modules'''
+
+        return cl.get_levels()
+
+    @api.response(200, 'Success')
+    @api.response(400, 'Invalid payload')
+    @metrics.func_measure(**http_duration_metric,
+                          labels={
+                              'method': 'put',
+                              'location': '/api/log/levels'
+                          })
+    def put(self):
+        '''set log levels given as JSON {module: level} without restart
+           (key "default" sets level of other modules, null level removes
+           level of a module)'''
+
+        levels = request.get_json(silent=True)
+        if not isinstance(levels, dict):
+            logging.warning("invalid log levels request: %s", request.get_data())
+            abort(400)
+        try:
+            ret = cl.set_levels(levels)
+        except ValueError as exc:
+            logging.warning("%s", exc)
+            abort(400, str(exc))
+        logging.info("log levels set: %s", levels)
+
+        return ret
+
+
 # url prefix /api/info/...
 
 ns_info = api.namespace('info',
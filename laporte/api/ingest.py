@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+'''
+Flask blueprint of a lean ingestion API accepting JSON and MessagePack bodies
+'''
+
+import logging
+import json
+import msgpack
+from flask import Blueprint, request, abort
+from laporte.app import event_id
+from laporte.metrics import metrics
+from laporte.metrics.common import http_duration_metric
+from laporte.core import sensors
+
+# create logger
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+ingest_bp = Blueprint('ingest', __name__, url_prefix='/api/ingest')
+
+JSON_MIMETYPES = ('application/json', )
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack',
+                     'application/vnd.msgpack')
+# native types of sensor values (bool is int)
+VALUE_TYPES = (int, float, str)
+
+
+def decode_body():
+    '''
+    decode a JSON or MessagePack request body, values keep their native types
+    abort with 415 if the content type is not supported, 400 if the body is invalid
+    '''
+
+    mimetype = request.mimetype
+    if mimetype in JSON_MIMETYPES:
+        loads = json.loads
+    elif mimetype in MSGPACK_MIMETYPES:
+        loads = msgpack.unpackb
+    else:
+        abort(415, f"unsupported content type {mimetype}")
+
+    try:
+        return loads(request.get_data(cache=False))
+    except ValueError as exc:  # json and msgpack decode errors are ValueErrors
+        logging.warning("invalid ingest request body: %s", exc)
+        abort(400, "invalid request body")
+
+
+def check_values(values):
+    '''abort with 400 if a sensor value is not a number, bool or string'''
+
+    if not all(isinstance(value, VALUE_TYPES) for value in values.values()):
+        abort(400, "sensor values must be numbers, booleans or strings")
+
+
+def decode_node_values():
+    '''decode a body with {sensor_id: value}'''
+
+    values = decode_body()
+    if not isinstance(values, dict):
+        abort(400, "request body is not a map of sensor values")
+    check_values(values)
+    return values
+
+
+def set_node_values(node_id, increment=False):
+    values = decode_node_values()
+    logging.debug("ingest request: %s: %s", node_id, values)
+    try:
+        sensors.set_node_values(node_id, values, increment=increment, batch=True)
+    except KeyError:
+        logging.warning("node %s or sensor not found", node_id)
+        abort(404)  # sensor not configured
+
+
+@ingest_bp.route('/<string:node_id>', methods=['PUT', 'POST'])
+@metrics.func_measure(**http_duration_metric,
+                      labels={
+                          'method': 'put',
+                          'location': '/api/ingest/<node_id>'
+                      })
+def ingest_node(node_id):
+    '''set sensors of a node given as {sensor_id: value}'''
+
+    event_id.set(add_prefix='api_')
+    set_node_values(node_id)
+    event_id.release()
+
+    return '', 204
+
+
+@ingest_bp.route('/inc/<string:node_id>', methods=['PUT', 'POST'])
+@metrics.func_measure(**http_duration_metric,
+                      labels={
+                          'method': 'put',
+                          'location': '/api/ingest/inc/<node_id>'
+                      })
+def ingest_inc_node(node_id):
+    '''increment sensor values of a node given as {sensor_id: value}'''
+
+    event_id.set(add_prefix='api_')
+    set_node_values(node_id, increment=True)
+    event_id.release()
+
+    return '', 204
+
+
+@ingest_bp.route('', methods=['PUT', 'POST'])
+@metrics.func_measure(**http_duration_metric,
+                      labels={
+                          'method': 'put',
+                          'location': '/api/ingest'
+                      })
+def ingest_nodes():
+    '''set sensors of many nodes given as {node_id: {sensor_id: value}}'''
+
+    event_id.set(add_prefix='api_')
+    nodes = decode_body()
+    if not isinstance(nodes, dict) or not all(
+            isinstance(node_data, dict) for node_data in nodes.values()):
+        abort(400, "request body is not a map of nodes")
+    for node_data in nodes.values():
+        check_values(node_data)
+    logging.debug("ingest nodes request: %s", nodes)
+    sensors.set_nodes_values(nodes)
+    event_id.release()
+
+    return '', 204
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+'''
+Cache of serialized views of sensor metrics
+'''
+
+import json
+import hashlib
+from flask import Response, request
+
+
+class ViewCache():
+    '''
+    Keep JSON of views of sensor metrics serialized until the change journal
+    records a change, so repeated polls of an unchanged state cost neither
+    collecting data of sensors nor serialization.
+    ETag of a view is a hash of its content, so it stays valid over restarts and
+    a client with an up-to-date view gets 304 Not Modified.
+    '''
+    def __init__(self, sensors):
+        self.sensors = sensors
+        self.views = {}  # name: (epoch, generation, etag, serialized view)
+
+    def get(self, name, get_view):
+        '''get (etag, serialized view), get_view is called only if state has changed'''
+
+        journal = self.sensors.journal
+        cached = self.views.get(name)
+
+        if cached is None or cached[0:2] != (journal.epoch, journal.generation):
+            # the same output as of flask-restx JSON representation
+            body = (json.dumps(get_view()) + '\n').encode('utf-8')
+            etag = hashlib.sha256(body).hexdigest()[0:32]
+            cached = self.views[name] = (journal.epoch, journal.generation, etag, body)
+
+        return cached[2], cached[3]
+
+    def response(self, name, get_view):
+        '''get a response with the view, or 304 if it matches If-None-Match'''
+
+        etag, body = self.get(name, get_view)
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        return response.make_conditional(request)
@@ -13,6 +13,7 @@ from laporte.metrics.common import (http_requests_metric, http_responses_metric,
                                     http_exception_responses_metric)
 from laporte.app.request_id import RequestID
 from laporte.app.event_id import EventID
+from laporte.app.sendqueue import QueuedManager
 
 # create logger
 logging.getLogger(__name__).addHandler(logging.NullHandler())
@@ -39,11 +40,16 @@ app.wsgi_app = ReverseProxyFix(app.wsgi_app)
 app.config.SWAGGER_UI_DOC_EXPANSION = 'list'
 bootstrap = Bootstrap(app)
 
+# bounded send queues of slow clients (policies are set by namespaces)
+send_queues = QueuedManager(max_items=pars.sio_queue_items,
+                            max_bytes=pars.sio_queue_bytes)
+
 sio = SocketIO(app,
                async_mode='gevent',
                logger=pars.log_verbose,
                engineio_logger=pars.log_verbose,
-               cors_allowed_origins="*")
+               cors_allowed_origins="*",
+               client_manager=send_queues)
 
 event_id = EventID()
 request_id = RequestID()
@@ -60,7 +66,8 @@ def http_request():
         logging.info('%s %s', request.method, request.path)
         logging.debug('headers = "%s"',
                       str(request.headers).encode("unicode_escape").decode("utf-8"))
-        logging.debug('body = "%s"', request.get_data().decode("utf-8"))
+        # binary bodies (e.g. MessagePack) are not valid UTF-8
+        logging.debug('body = "%s"', request.get_data().decode("utf-8", "replace"))
 
 
 @app.after_request
@@ -84,7 +91,12 @@ def http_response(response):
         logging.info('status = "%s"', response.status)
         logging.debug('headers = "%s"',
                       str(response.headers).encode("unicode_escape").decode("utf-8"))
-        logging.debug('body = "%s"', response.get_data().decode("utf-8"))
+        if response.content_encoding:
+            # e.g. gzip metrics, not text
+            logging.debug('body = <%s encoded, %d bytes>', response.content_encoding,
+                          response.content_length)
+        else:
+            logging.debug('body = "%s"', response.get_data().decode("utf-8", "replace"))
 
     return response
 
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+'''
+Bounded ring buffer for event and log history
+'''
+
+import json
+from collections import deque
+from itertools import islice
+
+
+class RingBuffer():
+    '''
+    History of items bounded by a number of items and/or by a total size in bytes.
+    Each appended item gets a sequence number (cursor), so a reader can get
+    only the items appended after the last one it has seen.
+    '''
+    def __init__(self, max_items=None, max_bytes=None):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.items = deque(maxlen=max_items)
+        self.sizes = deque(maxlen=max_items)
+        self.total_bytes = 0
+        self.last_seq = 0
+
+    def clear(self):
+        '''remove all items, sequence numbers continue'''
+
+        self.items.clear()
+        self.sizes.clear()
+        self.total_bytes = 0
+
+    def append(self, item, size=None):
+        '''
+        append an item, drop the oldest ones when a limit is exceeded
+        size is length of the serialized item, computed when a bytes limit is set
+        return sequence number of the item
+        '''
+
+        if self.max_bytes:
+            if size is None:
+                size = len(json.dumps(item))
+        else:
+            size = 0
+
+        if self.max_items is not None and len(self.items) == self.max_items:
+            # deque with maxlen drops the oldest item on its own
+            self.total_bytes -= self.sizes[0]
+
+        self.last_seq += 1
+        self.items.append(item)
+        self.sizes.append(size)
+        self.total_bytes += size
+
+        if self.max_bytes:
+            while len(self.items) > 1 and self.total_bytes > self.max_bytes:
+                self.items.popleft()
+                self.total_bytes -= self.sizes.popleft()
+
+        return self.last_seq
+
+    def first_seq(self):
+        '''get sequence number of the oldest stored item'''
+
+        return self.last_seq - len(self.items) + 1
+
+    def since(self, seq=None):
+        '''get list of items appended after sequence number seq (all if None)'''
+
+        if seq is None:
+            return list(self.items)
+
+        # read from the newest end, so the cost depends on number of new items
+        count = min(max(self.last_seq - seq, 0), len(self.items))
+        ret = list(islice(reversed(self.items), count))
+        ret.reverse()
+        return ret
+
+    def __len__(self):
+        return len(self.items)
+
+    def __iter__(self):
+        return iter(self.items)
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+'''
+Socket.IO client manager with bounded per-client send queues
+'''
+
+import logging
+from collections import deque
+import socketio
+from socketio import packet
+from engineio import packet as eio_packet
+from laporte.metrics import metrics
+from laporte.metrics.common import sio_queue_dropped_metric, sio_queue_coalesced_metric
+
+# create logger
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+SEND_QUEUE_ITEMS = 1024
+SEND_QUEUE_BYTES = 1048576
+# packets waiting in the Engine.IO queue of a client, above it messages are queued
+ENGINE_BACKLOG = 16
+DRAIN_INTERVAL = 0.05
+
+# overflow policies
+DROP_OLDEST = 'drop_oldest'
+COALESCE = 'coalesce'
+
+
+class Message():
+    '''a message (event, data) with its packets encoded once for all recipients'''
+
+    __slots__ = ('event', 'data', 'packets', 'size')
+
+    def __init__(self, event, data, namespace, packet_class=packet.Packet):
+        self.event = event
+        self.data = data
+        pkt = packet_class(packet.EVENT, namespace=namespace, data=[event] + data)
+        encoded_packet = pkt.encode()
+        if not isinstance(encoded_packet, list):
+            encoded_packet = [encoded_packet]
+        self.packets = [eio_packet.Packet(eio_packet.MESSAGE, p) for p in encoded_packet]
+        self.size = sum(len(p) for p in encoded_packet)
+
+
+class SendQueue():
+    '''
+    Messages of a client waiting until the client keeps up, bounded by number
+    of messages and bytes. On overflow the queue is coalesced by a function
+    [(event, data)] -> [(event, data)] (COALESCE policy) and the oldest messages
+    are dropped when it is still full.
+    '''
+    def __init__(self, manager, namespace):
+        self.manager = manager
+        self.namespace = namespace
+        (self.policy, self.coalesce, self.dropped,
+         self.coalesced) = manager.policies[namespace]
+        self.messages = deque()
+        self.size = 0
+
+    def __len__(self):
+        return len(self.messages)
+
+    def is_full(self):
+        return (len(self.messages) > self.manager.max_items
+                or (self.manager.max_bytes and self.size > self.manager.max_bytes))
+
+    def __coalesce(self):
+        messages = {id(message.data): message for message in self.messages}
+        items = self.coalesce([(message.event, message.data) for message in self.messages])
+
+        self.coalesced['total'] += len(self.messages) - len(items)
+        self.messages = deque(
+            messages.get(id(data)) or self.manager.make_message(event, data, self.namespace)
+            for event, data in items)
+        self.size = sum(message.size for message in self.messages)
+
+    def put(self, message):
+        '''append a message, apply the overflow policy if the queue is full'''
+
+        self.messages.append(message)
+        self.size += message.size
+        if not self.is_full():
+            return
+
+        if self.policy == COALESCE:
+            self.__coalesce()
+
+        # the newest message is always kept
+        while self.is_full() and len(self.messages) > 1:
+            self.size -= self.messages.popleft().size
+            self.dropped['total'] += 1
+
+    def get(self):
+        '''pop the oldest message'''
+
+        message = self.messages.popleft()
+        self.size -= message.size
+        return message
+
+
+class QueuedManager(socketio.Manager):
+    '''
+    Socket.IO client manager, messages to clients of namespaces with a policy
+    are sent directly while Engine.IO queue of a client is short, otherwise they
+    wait in a bounded send queue of the client drained by a background task.
+    So a slow client does not make the server buffer unboundedly.
+    '''
+    def __init__(self, max_items=SEND_QUEUE_ITEMS, max_bytes=SEND_QUEUE_BYTES):
+        super().__init__()
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.policies = {}  # namespace: (policy, coalesce function, counter slots)
+        self.queues = {}  # (namespace, sid): SendQueue (only non-empty ones)
+        self.draining = False
+
+    def set_policy(self, namespace, policy=DROP_OLDEST, coalesce=None):
+        '''queue messages of a namespace with an overflow policy'''
+
+        self.policies[namespace] = (policy, coalesce,
+                                    metrics.get_counter(**sio_queue_dropped_metric,
+                                                        labels={'namespace': namespace}),
+                                    metrics.get_counter(**sio_queue_coalesced_metric,
+                                                        labels={'namespace': namespace}))
+
+    def make_message(self, event, data, namespace):
+        return Message(event, data, namespace, self.server.packet_class)
+
+    def get_depths(self):
+        '''get {namespace: (queued clients, messages, bytes)}'''
+
+        ret = {namespace: (0, 0, 0) for namespace in self.policies}
+        for (namespace, _), queue in self.queues.items():
+            (clients, items, size) = ret[namespace]
+            ret[namespace] = (clients + 1, items + len(queue), size + queue.size)
+        return ret
+
+    def __get_backlog(self, eio_sid):
+        '''get number of packets waiting in Engine.IO queue of a client'''
+
+        socket = self.server.eio.sockets.get(eio_sid)
+        if socket is None or socket.closed:
+            return None
+        return socket.queue.qsize()
+
+    def __send(self, eio_sid, message):
+        for pkt in message.packets:
+            self.server._send_eio_packet(eio_sid, pkt)  # pylint: disable=protected-access
+
+    def emit(self, event, data, namespace, room=None, skip_sid=None, callback=None,
+             to=None, **kwargs):
+        if callback or namespace not in self.policies or namespace not in self.rooms:
+            return super().emit(event,
+                                data,
+                                namespace,
+                                room=room,
+                                skip_sid=skip_sid,
+                                callback=callback,
+                                to=to,
+                                **kwargs)
+
+        if isinstance(data, tuple):
+            data = list(data)
+        elif data is not None:
+            data = [data]
+        else:
+            data = []
+        if not isinstance(skip_sid, list):
+            skip_sid = [skip_sid]
+
+        message = self.make_message(event, data, namespace)
+        for sid, eio_sid in self.get_participants(namespace, to or room):
+            if sid in skip_sid:
+                continue
+
+            queue = self.queues.get((namespace, sid))
+            if queue is None:
+                backlog = self.__get_backlog(eio_sid)
+                if backlog is None or backlog < ENGINE_BACKLOG:
+                    self.__send(eio_sid, message)
+                    continue
+
+                queue = self.queues[(namespace, sid)] = SendQueue(self, namespace)
+                if not self.draining:
+                    self.draining = True
+                    self.server.start_background_task(self.__drain)
+
+            queue.put(message)
+        return None
+
+    def __drain(self):
+        '''move queued messages to Engine.IO queues of clients keeping up'''
+
+        try:
+            while self.queues:
+                self.server.sleep(DRAIN_INTERVAL)
+                for key, queue in list(self.queues.items()):
+                    (namespace, sid) = key
+                    eio_sid = self.eio_sid_from_sid(sid, namespace)
+                    backlog = None if eio_sid is None else self.__get_backlog(eio_sid)
+                    while backlog is not None and backlog < ENGINE_BACKLOG and queue:
+                        self.__send(eio_sid, queue.get())
+                        backlog = self.__get_backlog(eio_sid)
+                    if backlog is None or not queue:
+                        del self.queues[key]
+        finally:
+            self.draining = False
+
+    def disconnect(self, sid, namespace, **kwargs):
+        self.queues.pop((namespace, sid), None)
+        return super().disconnect(sid, namespace, **kwargs)
@@ -14,6 +14,21 @@ LISTEN_PORT_DEFAULT = 9128
 CONFIG_DIR_DEFAULT = 'conf'
 CONFIG_FILE_DEFAULT = 'conf/sensors.yml'
 CONFIG_JINJA_DEFAULT = False
+EVENT_HISTORY_ITEMS_DEFAULT = 2048
+EVENT_HISTORY_BYTES_DEFAULT = 0
+LOG_HISTORY_ITEMS_DEFAULT = 2048
+LOG_HISTORY_BYTES_DEFAULT = 0
+METRICS_EXPORT_CHOICES = ['cache', 'stream']
+METRICS_EXPORT_DEFAULT = 'cache'
+TTL_RESOLUTION_DEFAULT = 0.5
+STATE_FILE_DEFAULT = ''
+STATE_SNAPSHOT_INTERVAL_DEFAULT = 300
+EVAL_COST_TOP_DEFAULT = 0
+PROFILER_DEFAULT = False
+EMIT_WINDOW_DEFAULT = 0.0
+ACTUATOR_EMIT_WINDOW_DEFAULT = 0.0
+SIO_QUEUE_ITEMS_DEFAULT = 1024
+SIO_QUEUE_BYTES_DEFAULT = 1048576
 
 
 def log_level_string_to_int(arg_string: str) -> int:
@@ -57,6 +72,48 @@ def get_pars():
         'LOG_VERBOSE': {
             'default': LOG_VERBOSE_DEFAULT
         },
+        'EVENT_HISTORY_ITEMS': {
+            'default': EVENT_HISTORY_ITEMS_DEFAULT
+        },
+        'EVENT_HISTORY_BYTES': {
+            'default': EVENT_HISTORY_BYTES_DEFAULT
+        },
+        'LOG_HISTORY_ITEMS': {
+            'default': LOG_HISTORY_ITEMS_DEFAULT
+        },
+        'LOG_HISTORY_BYTES': {
+            'default': LOG_HISTORY_BYTES_DEFAULT
+        },
+        'METRICS_EXPORT': {
+            'default': METRICS_EXPORT_DEFAULT
+        },
+        'TTL_RESOLUTION': {
+            'default': TTL_RESOLUTION_DEFAULT
+        },
+        'STATE_FILE': {
+            'default': STATE_FILE_DEFAULT
+        },
+        'STATE_SNAPSHOT_INTERVAL': {
+            'default': STATE_SNAPSHOT_INTERVAL_DEFAULT
+        },
+        'EVAL_COST_TOP': {
+            'default': EVAL_COST_TOP_DEFAULT
+        },
+        'PROFILER': {
+            'default': PROFILER_DEFAULT
+        },
+        'EMIT_WINDOW': {
+            'default': EMIT_WINDOW_DEFAULT
+        },
+        'ACTUATOR_EMIT_WINDOW': {
+            'default': ACTUATOR_EMIT_WINDOW_DEFAULT
+        },
+        'SIO_QUEUE_ITEMS': {
+            'default': SIO_QUEUE_ITEMS_DEFAULT
+        },
+        'SIO_QUEUE_BYTES': {
+            'default': SIO_QUEUE_BYTES_DEFAULT
+        },
     }
 
     # defaults overriden from ENVs
@@ -127,6 +184,113 @@ def get_pars():
                         help='most verbose debug level '
                         '(console only; useful for a bug hunt :)',
                         **env_vars['LOG_VERBOSE'])
+    parser.add_argument('--event-history-items',
+                        action='store',
+                        dest='event_history_items',
+                        help=("max number of events kept in history "
+                              f"(default {EVENT_HISTORY_ITEMS_DEFAULT})"),
+                        type=int,
+                        **env_vars['EVENT_HISTORY_ITEMS'])
+    parser.add_argument('--event-history-bytes',
+                        action='store',
+                        dest='event_history_bytes',
+                        help=("max size of events kept in history in bytes, 0 = unlimited "
+                              f"(default {EVENT_HISTORY_BYTES_DEFAULT})"),
+                        type=int,
+                        **env_vars['EVENT_HISTORY_BYTES'])
+    parser.add_argument('--log-history-items',
+                        action='store',
+                        dest='log_history_items',
+                        help=("max number of log messages kept in history "
+                              f"(default {LOG_HISTORY_ITEMS_DEFAULT})"),
+                        type=int,
+                        **env_vars['LOG_HISTORY_ITEMS'])
+    parser.add_argument('--log-history-bytes',
+                        action='store',
+                        dest='log_history_bytes',
+                        help=("max size of log messages kept in history in bytes, "
+                              f"0 = unlimited (default {LOG_HISTORY_BYTES_DEFAULT})"),
+                        type=int,
+                        **env_vars['LOG_HISTORY_BYTES'])
+    parser.add_argument('--metrics-export',
+                        action='store',
+                        dest='metrics_export',
+                        choices=METRICS_EXPORT_CHOICES,
+                        help=("export of sensor metrics: cache = serve from "
+                              "pre-serialized cache, stream = build families one "
+                              f"by one on each scrape (default {METRICS_EXPORT_DEFAULT})"),
+                        type=str,
+                        **env_vars['METRICS_EXPORT'])
+    parser.add_argument('--ttl-resolution',
+                        action='store',
+                        dest='ttl_resolution',
+                        help=("resolution of TTL expiration in seconds, sensors expiring "
+                              "within the same interval are reset at once "
+                              f"(default {TTL_RESOLUTION_DEFAULT})"),
+                        type=float,
+                        **env_vars['TTL_RESOLUTION'])
+    parser.add_argument('--state-file',
+                        action='store',
+                        dest='state_file',
+                        help=("file to persist state of sensors over restart, "
+                              "changes are logged to the file with .log suffix "
+                              "(default disabled)"),
+                        type=str,
+                        **env_vars['STATE_FILE'])
+    parser.add_argument('--state-snapshot-interval',
+                        action='store',
+                        dest='state_snapshot_interval',
+                        help=("interval of state snapshots in seconds, 0 = on shutdown "
+                              f"only (default {STATE_SNAPSHOT_INTERVAL_DEFAULT})"),
+                        type=int,
+                        **env_vars['STATE_SNAPSHOT_INTERVAL'])
+    parser.add_argument('--eval-cost-top',
+                        action='store',
+                        dest='eval_cost_top',
+                        help=("export eval cost metrics of only the given number of "
+                              "the most expensive sensors, 0 = all sensors with eval "
+                              f"(default {EVAL_COST_TOP_DEFAULT})"),
+                        type=int,
+                        **env_vars['EVAL_COST_TOP'])
+    parser.add_argument('--profiler',
+                        action='store_true',
+                        dest='profiler',
+                        help=("enable the sampling profiler at /status/profile "
+                              f"(default {PROFILER_DEFAULT})"),
+                        **env_vars['PROFILER'])
+    parser.add_argument('--emit-window',
+                        action='store',
+                        dest='emit_window',
+                        help=("window in seconds to coalesce changes of sensors into one "
+                              "event emitted to Socket.IO clients, e.g. 0.02 - 0.1, "
+                              f"0 = emit each change (default {EMIT_WINDOW_DEFAULT})"),
+                        type=float,
+                        **env_vars['EMIT_WINDOW'])
+    parser.add_argument('--actuator-emit-window',
+                        action='store',
+                        dest='actuator_emit_window',
+                        help=("window in seconds to coalesce changes of actuators "
+                              "emitted to gateways, keep it short to keep control "
+                              "latency low, 0 = emit each change "
+                              f"(default {ACTUATOR_EMIT_WINDOW_DEFAULT})"),
+                        type=float,
+                        **env_vars['ACTUATOR_EMIT_WINDOW'])
+    parser.add_argument('--sio-queue-items',
+                        action='store',
+                        dest='sio_queue_items',
+                        help=("max number of messages waiting in a send queue of a slow "
+                              "Socket.IO client of events or logs "
+                              f"(default {SIO_QUEUE_ITEMS_DEFAULT})"),
+                        type=int,
+                        **env_vars['SIO_QUEUE_ITEMS'])
+    parser.add_argument('--sio-queue-bytes',
+                        action='store',
+                        dest='sio_queue_bytes',
+                        help=("max size of messages waiting in a send queue of a slow "
+                              "Socket.IO client in bytes, 0 = unlimited "
+                              f"(default {SIO_QUEUE_BYTES_DEFAULT})"),
+                        type=int,
+                        **env_vars['SIO_QUEUE_BYTES'])
     return parser.parse_args()
 
 
@@ -5,10 +5,11 @@ Objects that create a Socket.OI client for Laporte
 
 import logging
 from time import sleep
+import msgpack
 import socketio
 from laporte.client.metrics import laporte_emits_total
 from laporte.client.sio import (DefaultNamespace, MetricsNamespace, EventsNamespace,
-                                METRICS_NAMESPACE, EVENTS_NAMESPACE)
+                                METRICS_NAMESPACE, EVENTS_NAMESPACE, MSGPACK)
 # create logger
 logging.getLogger(__name__).addHandler(logging.NullHandler())
 
@@ -21,7 +22,9 @@ class LaporteClient():
                  addr: str,
                  port: int,
                  gateways: list = None,
-                 events: bool = False) -> None:
+                 events: bool = False,
+                 events_filter: dict = None,
+                 encoding: str = MSGPACK) -> None:
         '''
         Connect to the laporte server.
 
@@ -35,13 +38,24 @@ class LaporteClient():
                 Defaults to None. Register metrics namespece if set.
             events (Optional[bool]):
                 Register events namespace. Defaults to False.
+            events_filter (Optional[Dict[str: Union[str, List[str]]]]):
+                Receive only events of sensors matching the filter with keys
+                gw, node_id (glob patterns), sensor_id and metrics.
+                Defaults to None (all events).
+            encoding (Optional[str]):
+                Encoding of messages requested from laporte, 'msgpack' (MessagePack
+                in binary attachments) or 'json'. Laporte not supporting it
+                sends JSON, messages are decoded by their type.
+                Defaults to 'msgpack'.
         '''
 
         namespaces = []
+        self.encoding = encoding
+        self.events = events
         self.sio = socketio.Client(logger=True, engineio_logger=True)
         self.ns_default = DefaultNamespace('/')
         self.ns_metrics = MetricsNamespace(METRICS_NAMESPACE)
-        self.ns_events = EventsNamespace(EVENTS_NAMESPACE)
+        self.ns_events = EventsNamespace(EVENTS_NAMESPACE, events_filter)
         self.sio.register_namespace(self.ns_default)
 
         if isinstance(gateways, list):
@@ -55,13 +69,23 @@ class LaporteClient():
 
         while True:
             try:
-                self.sio.connect(f'http://{addr}:{port}', namespaces=namespaces)
+                self.sio.connect(f'http://{addr}:{port}',
+                                 auth=self.get_auth,
+                                 namespaces=namespaces)
             except socketio.exceptions.ConnectionError as exc:
                 logging.error("%s", exc)
                 sleep(10)
             else:
                 break
 
+    def get_auth(self):
+        '''auth passed upon (re)connection of each namespace'''
+
+        auth = {'encoding': self.encoding}
+        if self.events:
+            auth.update(self.ns_events.get_auth())
+        return auth
+
     def loop(self):
         '''main loop for Socket.IO client'''
 
@@ -72,4 +96,8 @@ class LaporteClient():
 
         logging.info("Laporte emit: %s %s", response, message)
         laporte_emits_total.labels(response, namespace).inc()
+        if (namespace == METRICS_NAMESPACE and self.ns_metrics.encoding == MSGPACK
+                and response in ('sensor_response', 'sensor_addr_response')):
+            # laporte has confirmed it accepts MessagePack
+            message = msgpack.packb(message)
         self.sio.emit(response, message, namespace=namespace)
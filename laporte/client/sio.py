@@ -1,19 +1,34 @@
 import logging
 import json
+import msgpack
 import socketio
 from laporte.client.metrics import (laporte_responses_total, laporte_connects_total)
 
 METRICS_NAMESPACE = '/metrics'
 EVENTS_NAMESPACE = '/events'
 
+# payload encodings of messages
+JSON = 'json'
+MSGPACK = 'msgpack'
+
 # create logger
 logging.getLogger(__name__).addHandler(logging.NullHandler())
 
 
+def decode(msg):
+    '''deserialize a message payload, binary ones are MessagePack, others JSON'''
+
+    if isinstance(msg, bytes):
+        return msgpack.unpackb(msg)
+    return json.loads(msg)
+
+
 class MetricsNamespace(socketio.ClientNamespace):
     '''class-based Socket.IO event handlers for metrics'''
 
     gateways = []
+    # encoding of messages confirmed by laporte upon connection
+    encoding = JSON
 
     @staticmethod
     def default_actuator_handler(gateway, node_id, sensors):
@@ -45,7 +60,7 @@ class MetricsNamespace(socketio.ClientNamespace):
         '''receive metrics of changed actuators identified by node_id/sensor_id'''
 
         laporte_responses_total.labels('actuator_response', METRICS_NAMESPACE).inc()
-        for gateway, nodes in json.loads(data).items():
+        for gateway, nodes in decode(data).items():
             for node_id, sensors in nodes.items():
                 self.actuator_handler(gateway, node_id, sensors)
 
@@ -53,7 +68,7 @@ class MetricsNamespace(socketio.ClientNamespace):
         '''receive metrics of changed actuators identified by node_addr/key'''
 
         laporte_responses_total.labels('actuator_addr_response', METRICS_NAMESPACE).inc()
-        for gateway, nodes in json.loads(data).items():
+        for gateway, nodes in decode(data).items():
             for node_addr, keys in nodes.items():
                 self.actuator_addr_handler(gateway, node_addr, keys)
 
@@ -63,12 +78,13 @@ class MetricsNamespace(socketio.ClientNamespace):
         laporte_responses_total.labels('config_response', METRICS_NAMESPACE).inc()
         self.config_handler(data)
 
-    @staticmethod
-    def on_status_response(data):
+    def on_status_response(self, data):
         '''receive and log status message from laporte'''
 
         laporte_responses_total.labels('status_response', METRICS_NAMESPACE).inc()
         logging.info("Laporte %s namespace status response: %s", METRICS_NAMESPACE, data)
+        if isinstance(data, dict) and 'encoding' in data:
+            self.encoding = data['encoding']
 
     def __join_gateways(self):
         '''join Socket.IO rooms called as same as gateways'''
@@ -119,10 +135,25 @@ class EventsNamespace(socketio.ClientNamespace):
     init_handler = default_init_handler
     update_handler = default_update_handler
 
-    def on_init_response(self, json_msg):
+    def __init__(self, namespace=None, event_filter=None):
+        super().__init__(namespace)
+        self.position = {}
+        self.event_filter = event_filter
+
+    def get_auth(self):
+        '''
+        auth passed upon (re)connection - position in the event stream,
+        so only the missed events are sent by laporte, and the event filter
+        '''
+
+        if self.event_filter is not None:
+            return dict(self.position, filter=self.event_filter)
+        return self.position
+
+    def on_init_response(self, msg):
         '''receive update of nodes from laporte'''
 
-        msg = json.loads(json_msg)
+        msg = decode(msg)
         try:
             data = msg['data']
         except KeyError as exc:
@@ -130,12 +161,10 @@ class EventsNamespace(socketio.ClientNamespace):
             return
 
         laporte_responses_total.labels('init_response', EVENTS_NAMESPACE).inc()
+        self.position = {'stream': msg.get('stream'), 'since': msg.get('seq')}
         self.init_handler(data)
 
-    def on_event_response(self, json_msg):
-        '''receive update of nodes event from laporte'''
-
-        msg = json.loads(json_msg)
+    def __update(self, msg):
         try:
             # time = msg['time']
             # event_id = msg['event_id']
@@ -144,10 +173,24 @@ class EventsNamespace(socketio.ClientNamespace):
             logging.error('invalid message: %s', exc)
             return
 
-        laporte_responses_total.labels('event_response', EVENTS_NAMESPACE).inc()
+        if 'seq' in msg and self.position:
+            self.position['since'] = msg['seq']
         for node_id, metrics in data.items():
             self.update_handler(node_id, metrics)
 
+    def on_event_response(self, msg):
+        '''receive update of nodes event from laporte'''
+
+        laporte_responses_total.labels('event_response', EVENTS_NAMESPACE).inc()
+        self.__update(decode(msg))
+
+    def on_resume_response(self, msgs):
+        '''receive events missed while disconnected'''
+
+        laporte_responses_total.labels('resume_response', EVENTS_NAMESPACE).inc()
+        for msg in decode(msgs):
+            self.__update(msg)
+
     @staticmethod
     def on_status_response(data):
         '''receive and log status message from laporte'''
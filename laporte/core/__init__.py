@@ -4,20 +4,33 @@ Laporte sensors core
 '''
 
 import logging
-import json
 from apscheduler.schedulers.gevent import GeventScheduler
-from flask_socketio import Namespace, emit, join_room, rooms
-from laporte.app import app, sio, event_id
+from flask import request
+from flask_socketio import Namespace, emit, join_room, leave_room, rooms
+from laporte.argparser import pars
+from laporte.app import app, sio, event_id, send_queues
+from laporte.app.sendqueue import COALESCE
 from laporte.metrics import metrics
 from laporte.metrics.common import socketio_duration_metric
 from laporte.core.sensors import METRICS_NAMESPACE, EVENTS_NAMESPACE
 from laporte.core.sensors import Sensors
+from laporte.core.encoding import get_encoding, encode, decode
+from laporte.core.window import EventsCoalescer
 
 # create logger
 logging.getLogger(__name__).addHandler(logging.NullHandler())
 
 scheduler = GeventScheduler()
-sensors = Sensors(app, sio, scheduler)
+sensors = Sensors(app,
+                  sio,
+                  scheduler,
+                  history_items=pars.event_history_items,
+                  history_bytes=pars.event_history_bytes,
+                  ttl_resolution=pars.ttl_resolution,
+                  state_file=pars.state_file,
+                  state_interval=pars.state_snapshot_interval,
+                  emit_window=pars.emit_window,
+                  actuator_emit_window=pars.actuator_emit_window)
 
 # SocketIO namespaces
 
@@ -35,14 +48,11 @@ class MetricsNamespace(Namespace):
         receive metrics of changed sensors identified by node_id/sensor_id
         '''
         event_id.set(add_prefix='sio_')
+        if isinstance(message, bytes):
+            message = decode(message)
+        logging.info('nodes update event: %s', message)
 
-        for node_id in message:
-            node_data = message[node_id]
-            logging.info('node update event: %s: %s', node_id, str(node_data))
-            try:
-                sensors.set_node_values(node_id, node_data)
-            except KeyError:
-                pass
+        sensors.set_nodes_values(message)
 
     @staticmethod
     @metrics.func_measure(**socketio_duration_metric,
@@ -55,14 +65,11 @@ class MetricsNamespace(Namespace):
         receive metrics of changed sensors identified by node_addr/key
         '''
         event_id.set(add_prefix='sio_')
+        if isinstance(message, bytes):
+            message = decode(message)
         logging.info('addr/key update event: %s', message)
 
-        for node_id, request_form in sensors.conv_addrs_to_ids(message).items():
-            logging.debug('update %s: %s', node_id, str(request_form))
-            try:
-                sensors.set_node_values(node_id, request_form)
-            except KeyError:
-                pass
+        sensors.set_nodes_values(sensors.conv_addrs_to_ids(message))
 
     @staticmethod
     @metrics.func_measure(**socketio_duration_metric,
@@ -75,7 +82,7 @@ class MetricsNamespace(Namespace):
 
         logging.debug("SocketIO client join: %s", message)
         gw = message['room']
-        join_room(gw)
+        join_room(sensors.gateway_rooms.join(request.sid, gw))
         emit('status_response', {'joined in': rooms()})
         emit('config_response', {gw: list(sensors.get_config_of_gw(gw))})
 
@@ -85,10 +92,23 @@ class MetricsNamespace(Namespace):
                               'event': 'connect',
                               'namespace': METRICS_NAMESPACE
                           })
-    def on_connect():
-        '''fired upon a successful connection'''
+    def on_connect(auth=None):
+        '''
+        fired upon a successful connection
+        a client passing {'encoding': 'msgpack'} in auth gets actuator responses
+        as MessagePack and may send sensor responses so, the encoding in use
+        is confirmed by the status response
+        '''
 
-        emit('status_response', {'status': 'connected'})
+        encoding = get_encoding(auth)
+        sensors.gateway_rooms.connect(request.sid, encoding)
+        emit('status_response', {'status': 'connected', 'encoding': encoding})
+
+    @staticmethod
+    def on_disconnect():
+        '''drop rooms of a disconnected client'''
+
+        sensors.gateway_rooms.disconnect(request.sid)
 
 
 class EventsNamespace(Namespace):
@@ -99,13 +119,99 @@ class EventsNamespace(Namespace):
                               'event': 'connect',
                               'namespace': EVENTS_NAMESPACE
                           })
-    def on_connect():
-        '''emit initital event after a successful connection'''
+    def on_connect(auth=None):
+        '''
+        emit initital event after a successful connection
+        a client passing {'stream': ..., 'since': seq} of the last seen event
+        in auth gets only the missed events, if they are still in history
+        a client passing {'filter': {...}} in auth gets only events passing
+        the filter (see EventFilter)
+        a client passing {'encoding': 'msgpack'} in auth gets messages
+        as MessagePack in binary attachments instead of JSON strings
+        '''
 
-        init_resp = {'data': sensors.get_metrics_dict_by_node(skip_None=False)}
-        emit('init_response', json.dumps(init_resp), namespace=EVENTS_NAMESPACE)
-        emit('hist_response', json.dumps(sensors.diff_buf), namespace=EVENTS_NAMESPACE)
+        if not isinstance(auth, dict):
+            auth = {}
+
+        encoding = get_encoding(auth)
+        try:
+            room, event_filter, _ = sensors.subscriptions.add(request.sid,
+                                                              auth.get('filter'),
+                                                              encoding)
+        except ValueError as exc:
+            logging.error("SocketIO client %s: invalid filter: %s", request.sid, exc)
+            raise ConnectionRefusedError(f"invalid filter: {exc}") from exc
+        join_room(room)
+
+        missed = sensors.get_missed_events(auth.get('stream'), auth.get('since'),
+                                           event_filter)
+        if missed is not None:
+            emit('resume_response', encode(missed, encoding), namespace=EVENTS_NAMESPACE)
+            return
+
+        emit('init_response',
+             sensors.get_init_msg(event_filter, encoding),
+             namespace=EVENTS_NAMESPACE)
+        emit('hist_response',
+             sensors.get_hist_msg(event_filter, encoding),
+             namespace=EVENTS_NAMESPACE)
+
+    @staticmethod
+    @metrics.func_measure(**socketio_duration_metric,
+                          labels={
+                              'event': 'subscribe',
+                              'namespace': EVENTS_NAMESPACE
+                          })
+    def on_subscribe(message):
+        '''
+        replace the subscription with events passing the filter in message,
+        None for all events, emit initial data of the new subscription
+        '''
+
+        spec = message.get('filter') if isinstance(message, dict) else None
+        try:
+            room, event_filter, prev_room = sensors.subscriptions.add(request.sid, spec)
+        except ValueError as exc:
+            emit('status_response', {'error': f"invalid filter: {exc}"})
+            return
+        if prev_room is not None and prev_room != room:
+            leave_room(prev_room)
+        join_room(room)
+
+        encoding = sensors.subscriptions.get_encoding(request.sid)
+        emit('init_response',
+             sensors.get_init_msg(event_filter, encoding),
+             namespace=EVENTS_NAMESPACE)
+
+    @staticmethod
+    def on_disconnect():
+        '''drop subscription of a disconnected client'''
+
+        sensors.subscriptions.disconnect(request.sid)
+
+    @staticmethod
+    @metrics.func_measure(**socketio_duration_metric,
+                          labels={
+                              'event': 'hist_request',
+                              'namespace': EVENTS_NAMESPACE
+                          })
+    def on_hist_request(message):
+        '''emit events from history newer than the event with given seq'''
+
+        since = message.get('since') if isinstance(message, dict) else None
+        if not isinstance(since, int):
+            # the whole history
+            since = None
+        events = sensors.diff_buf.since(since)
+        event_filter = sensors.subscriptions.get_filter(request.sid)
+        if event_filter is not None:
+            events = event_filter.apply_events(events, sensors.node_id_index)
+        emit('hist_response',
+             encode(events, sensors.subscriptions.get_encoding(request.sid)),
+             namespace=EVENTS_NAMESPACE)
 
 
 sio.on_namespace(MetricsNamespace(METRICS_NAMESPACE))
 sio.on_namespace(EventsNamespace(EVENTS_NAMESPACE))
+# a slow client of events gets the latest state of sensors
+send_queues.set_policy(EVENTS_NAMESPACE, COALESCE, EventsCoalescer())
@@ -0,0 +1,121 @@
+# -*- coding: utf-8 -*-
+'''
+Dependency graph of sensors given by eval require config
+'''
+
+import logging
+
+# create logger
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class DependencyGraph():
+    '''
+    Map (node_id, sensor_id) of a sensor to its required and requiring sensors.
+    Eval require entries are resolved once, when a sensor is added.
+    '''
+    def __init__(self):
+        self.requires = {}
+        self.dependents = {}
+
+    def reset(self):
+        self.requires = {}
+        self.dependents = {}
+
+    def add(self, node_id, sensor_id, eval_require):
+        '''
+        add a sensor with its eval require config {var: [node_id, sensor_id, metric]}
+        return False if the config is invalid
+        '''
+
+        if eval_require is None:
+            return True
+
+        key = (node_id, sensor_id)
+        requires = []
+
+        for var, metric_list in eval_require.items():
+            if len(metric_list) == 3:
+                (req_node_id, req_sensor_id, metric_name) = tuple(metric_list)
+            elif len(metric_list) == 2:
+                (req_sensor_id, metric_name) = tuple(metric_list)
+                req_node_id = node_id
+            else:
+                logging.error("%s.%s: error in eval_require config %s", node_id,
+                              sensor_id, eval_require)
+                self.requires[key] = None
+                return False
+
+            requires.append((var, req_node_id, req_sensor_id, metric_name))
+
+        self.requires[key] = requires
+
+        for (_, req_node_id, req_sensor_id, _) in requires:  # unused var, metric_name
+            req_key = (req_node_id, req_sensor_id)
+            if req_key not in self.dependents:
+                self.dependents[req_key] = []
+            if key not in self.dependents[req_key]:
+                self.dependents[req_key].append(key)
+
+        return True
+
+    def remove(self, node_id, sensor_id):
+        '''remove edges from a sensor to its required sensors'''
+
+        key = (node_id, sensor_id)
+        requires = self.requires.pop(key, None)
+
+        if requires is None:
+            return
+
+        for (_, req_node_id, req_sensor_id, _) in requires:  # unused var, metric_name
+            dependents = self.dependents.get((req_node_id, req_sensor_id), [])
+            if key in dependents:
+                dependents.remove(key)
+
+    def get_requires(self, node_id, sensor_id):
+        '''
+        get resolved require entries [(var, node_id, sensor_id, metric)] of a sensor
+        return None if eval require config is invalid
+        '''
+
+        return self.requires.get((node_id, sensor_id), [])
+
+    def get_dependents(self, node_id, sensor_id):
+        '''get list of (node_id, sensor_id) of sensors requiring a sensor'''
+
+        return self.dependents.get((node_id, sensor_id), [])
+
+    def topological_order(self, keys=None):
+        '''
+        get (node_id, sensor_id) of sensors reachable from given keys
+        (or of the whole graph) so that each sensor precedes its dependents;
+        edges closing a cycle are ignored
+        '''
+
+        if keys is None:
+            keys = list(self.dependents) + list(self.requires)
+
+        visited = set()
+        order = []
+
+        for root in keys:
+            if root in visited:
+                continue
+            visited.add(root)
+            stack = [(root, iter(self.dependents.get(root, [])))]
+
+            # iterative DFS, reversed postorder is a topological order
+            while stack:
+                key, children = stack[-1]
+                for child in children:
+                    if child not in visited:
+                        visited.add(child)
+                        stack.append((child, iter(self.dependents.get(child, []))))
+                        break
+                else:
+                    stack.pop()
+                    order.append(key)
+
+        order.reverse()
+        return order
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+'''
+Payload encodings of Socket.IO messages negotiated by clients
+'''
+
+import logging
+import json
+import msgpack
+
+# create logger
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+# JSON strings (the default, used by browsers)
+JSON = 'json'
+# MessagePack in binary attachments
+MSGPACK = 'msgpack'
+
+ENCODINGS = (JSON, MSGPACK)
+
+
+def get_encoding(auth):
+    '''get encoding requested by a client in connect auth, JSON if unknown'''
+
+    encoding = auth.get('encoding', JSON) if isinstance(auth, dict) else JSON
+    if encoding not in ENCODINGS:
+        logging.warning("unknown encoding %s requested, %s is used", encoding, JSON)
+        return JSON
+    return encoding
+
+
+def encode(data, encoding):
+    '''serialize data to a message payload of given encoding'''
+
+    if encoding == MSGPACK:
+        return msgpack.packb(data)
+    return json.dumps(data)
+
+
+def decode(msg):
+    '''deserialize a message payload, binary ones are MessagePack'''
+
+    if isinstance(msg, bytes):
+        return msgpack.unpackb(msg)
+    return json.loads(msg)
+
+
+def get_room(room, encoding):
+    '''get name of Socket.IO room of members using given encoding'''
+
+    if encoding == JSON:
+        return room
+    return f'{room}:{encoding}'
+
+
+class EncodedRooms():
+    '''
+    Socket.IO rooms split by encoding of their members,
+    so a message is encoded once per encoding in use and emitted to each part
+    '''
+    def __init__(self):
+        self.encodings = {}  # sid: encoding
+        self.sid_rooms = {}  # sid: set of rooms
+        self.members = {}  # room: {encoding: number of members}
+
+    def connect(self, sid, encoding=JSON):
+        '''set encoding of a client'''
+
+        self.encodings[sid] = encoding
+
+    def disconnect(self, sid):
+        '''remove a client from all rooms'''
+
+        for room in list(self.sid_rooms.get(sid, ())):
+            self.leave(sid, room)
+        self.encodings.pop(sid, None)
+
+    def get_encoding(self, sid):
+        '''get encoding of a client'''
+
+        return self.encodings.get(sid, JSON)
+
+    def join(self, sid, room):
+        '''register a client in a room, return name of the Socket.IO room to join'''
+
+        encoding = self.get_encoding(sid)
+        rooms = self.sid_rooms.setdefault(sid, set())
+        if room not in rooms:
+            rooms.add(room)
+            counts = self.members.setdefault(room, {})
+            counts[encoding] = counts.get(encoding, 0) + 1
+        return get_room(room, encoding)
+
+    def leave(self, sid, room):
+        '''unregister a client from a room, return name of the Socket.IO room to leave'''
+
+        rooms = self.sid_rooms.get(sid)
+        if rooms is None or room not in rooms:
+            return None
+
+        rooms.discard(room)
+        if not rooms:
+            del self.sid_rooms[sid]
+
+        encoding = self.get_encoding(sid)
+        counts = self.members[room]
+        counts[encoding] -= 1
+        if not counts[encoding]:
+            del counts[encoding]
+        if not counts:
+            del self.members[room]
+        return get_room(room, encoding)
+
+    def get_encodings(self, room):
+        '''get encodings used by members of a room'''
+
+        return list(self.members.get(room, ()))
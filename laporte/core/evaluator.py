@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+'''
+Eval engine with parsed code cache for computed sensors
+'''
+
+import logging
+import re
+from time import time
+from asteval import Interpreter, make_symbol_table
+
+# create logger
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class Devnull():
+    '''writer that drops all output of evaluated code'''
+    def write(self, *_):
+        pass
+
+
+class EvalEngine():
+    '''
+    Evaluate sensor eval code using one pooled interpreter.
+    The base symbol table is built once and eval code is parsed once,
+    only per-call variables are injected into a copy of the base symbol table.
+    '''
+    def __init__(self):
+        self.aeval = Interpreter(writer=Devnull(),
+                                 err_writer=Devnull(),
+                                 symtable=make_symbol_table(use_numpy=True, re=re))
+        self.base_symtable = dict(self.aeval.symtable)
+        self.code_cache = {}
+
+    def reset(self):
+        '''drop parsed code (on config reload)'''
+
+        self.code_cache = {}
+
+    def prune(self, codes):
+        '''drop parsed code not in given codes (on incremental config reload)'''
+
+        self.code_cache = {
+            code: node
+            for code, node in self.code_cache.items() if code in codes
+        }
+
+    def compile(self, code):
+        '''
+        parse eval code into the cache
+        return None if code can't be parsed
+        '''
+
+        if code is None:
+            return None
+
+        if code in self.code_cache:
+            return self.code_cache[code]
+
+        aeval = self.aeval
+        aeval.error = []
+        try:
+            node = aeval.parse(code)
+        except Exception:  # pylint: disable=broad-except
+            # keep None, parse errors are reported by eval of the code text
+            node = None
+        aeval.error = []
+
+        self.code_cache[code] = node
+        return node
+
+    def eval(self, code, symbols):
+        '''
+        evaluate code with symbols added to the base symbol table
+        return (result, list of errors)
+        '''
+
+        aeval = self.aeval
+        symtable = self.base_symtable.copy()
+        symtable.update(symbols)
+        aeval.symtable = symtable
+
+        node = self.compile(code)
+        if node is None:
+            result = aeval.eval(code)
+            return result, aeval.error
+
+        aeval.lineno = 0
+        aeval.error = []
+        aeval.error_msg = None
+        aeval.retval = None
+        aeval._interrupt = None  # pylint: disable=protected-access
+        aeval.code_text = []
+        aeval.start_time = time()
+        try:
+            result = aeval.run(node, expr=code, lineno=0, with_raise=False)
+        except Exception:  # pylint: disable=broad-except
+            result = None
+
+        return result, aeval.error
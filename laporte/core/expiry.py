@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+'''
+Timing wheel of sensor TTL deadlines
+'''
+
+import logging
+import heapq
+from math import ceil
+from time import time
+from datetime import datetime
+from apscheduler.triggers.date import DateTrigger
+
+# create logger
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+TTL_RESOLUTION = 0.5
+EXPIRY_JOB_ID = 'ttl_expiry'
+
+
+class ExpiryWheel():
+    '''
+    Deadlines of sensors hashed into buckets (ticks) of a given resolution.
+    Refreshing a deadline moves a sensor between two buckets in O(1),
+    sensors of all elapsed buckets are passed to the callback at once.
+    Only one scheduler job is kept - for the earliest bucket.
+    '''
+    def __init__(self, scheduler, callback, resolution=TTL_RESOLUTION):
+        self.scheduler = scheduler
+        self.callback = callback
+        self.resolution = resolution
+        self.reset()
+
+    def reset(self):
+        self.buckets = {}  # tick: {sensor: event id}
+        self.ticks = {}  # sensor: tick
+        self.heap = []  # ticks of buckets (may contain ticks of removed buckets)
+        self.job_tick = None
+
+    def __discard(self, sensor, tick):
+        bucket = self.buckets[tick]
+        del bucket[sensor]
+        if not bucket:
+            del self.buckets[tick]
+
+    def __schedule(self, tick):
+        '''(re)schedule the job to the end of the bucket tick'''
+
+        self.job_tick = tick
+        self.scheduler.add_job(func=self.expire,
+                               trigger=DateTrigger(
+                                   run_date=datetime.fromtimestamp(tick * self.resolution)),
+                               id=EXPIRY_JOB_ID,
+                               misfire_grace_time=None,
+                               replace_existing=True)
+
+    def add(self, sensor, deadline, eid=None):
+        '''set (or move) deadline of a sensor, eid is an event ID of the cause'''
+
+        tick = ceil(deadline / self.resolution)
+        old_tick = self.ticks.get(sensor)
+        if old_tick is not None:
+            self.__discard(sensor, old_tick)
+
+        self.ticks[sensor] = tick
+        if tick not in self.buckets:
+            self.buckets[tick] = {}
+            heapq.heappush(self.heap, tick)
+        self.buckets[tick][sensor] = eid
+
+        if self.job_tick is None or tick < self.job_tick:
+            self.__schedule(tick)
+
+    def remove(self, sensor):
+        '''remove deadline of a sensor (if any)'''
+
+        tick = self.ticks.pop(sensor, None)
+        if tick is not None:
+            self.__discard(sensor, tick)
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def expire(self):
+        '''
+        called from scheduler job, pass [(sensor, event id)] of all sensors
+        with elapsed deadline to the callback and schedule the next bucket
+        '''
+
+        now = time()
+        expired = []
+        while self.heap and self.heap[0] * self.resolution <= now:
+            tick = heapq.heappop(self.heap)
+            for sensor, eid in self.buckets.pop(tick, {}).items():
+                del self.ticks[sensor]
+                expired.append((sensor, eid))
+
+        # skip ticks of removed buckets
+        while self.heap and self.heap[0] not in self.buckets:
+            heapq.heappop(self.heap)
+
+        self.job_tick = None
+        if self.heap:
+            self.__schedule(self.heap[0])
+
+        if expired:
+            logging.debug("scheduler: %d TTL deadlines expired", len(expired))
+            self.callback(expired)
@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+'''
+Journal of changed sensor metrics
+'''
+
+import logging
+
+# create logger
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+class ChangeJournal():
+    '''
+    Record which metrics of which sensors have changed since the last diff,
+    so a diff can be produced in O(changed) instead of O(all sensors).
+    Sensors changed since the last export are kept separately, together with
+    a generation (bumped on every change) and an epoch (bumped when the set
+    of tracked sensors changes), so an exporter can tell what to refresh.
+    '''
+    def __init__(self):
+        self.keys = {}
+        self.dirty = {}
+        self.export_dirty = {}
+        self.generation = 0
+        self.epoch = 0
+
+    def reset(self):
+        self.keys = {}
+        self.dirty = {}
+        self.export_dirty = {}
+        self.generation += 1
+        self.epoch += 1
+
+    def track(self, sensor, node_id, sensor_id):
+        '''
+        register a sensor under its node_id/sensor_id
+        a newly tracked sensor is fully dirty
+        '''
+
+        self.keys[sensor] = (node_id, sensor_id)
+        sensor.journal = self
+        self.record(sensor)
+
+    def untrack(self, sensor):
+        '''unregister a sensor, drop its unprocessed changes'''
+
+        self.keys.pop(sensor, None)
+        self.dirty.pop(sensor, None)
+        self.export_dirty.pop(sensor, None)
+        sensor.journal = None
+        self.generation += 1
+        self.epoch += 1
+
+    def record(self, sensor, metric=None):
+        '''
+        record a changed metric of a sensor
+        metric None means all metrics of the sensor
+        '''
+
+        if sensor not in self.keys:
+            return
+
+        self.generation += 1
+        self.export_dirty[sensor] = None
+
+        if sensor not in self.dirty:
+            self.dirty[sensor] = None if metric is None else {metric}
+        elif metric is None:
+            self.dirty[sensor] = None
+        elif self.dirty[sensor] is not None:
+            self.dirty[sensor].add(metric)
+
+    def pop(self):
+        '''
+        get changes recorded since the last pop
+        yield (node_id, sensor_id, sensor, set of metrics or None for all)
+        '''
+
+        dirty = self.dirty
+        self.dirty = {}
+
+        for sensor, metrics in dirty.items():
+            node_id, sensor_id = self.keys[sensor]
+            yield node_id, sensor_id, sensor, metrics
+
+    def pop_export(self):
+        '''get sensors changed since the last pop_export (as dict keys, in order of change)'''
+
+        export_dirty = self.export_dirty
+        self.export_dirty = {}
+        return export_dirty
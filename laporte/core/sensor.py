@@ -4,14 +4,13 @@ Objects that collect internal states (and config) of one sensor
 '''
 
 import logging
-import re
 from typing import Any
-from copy import deepcopy
+from operator import attrgetter
 from abc import ABC, abstractmethod
 from time import time
 from datetime import datetime
-from asteval import Interpreter, make_symbol_table
 from apscheduler.job import Job
+from laporte.core.evaluator import EvalEngine
 
 # create logger
 logging.getLogger(__name__).addHandler(logging.NullHandler())
@@ -24,70 +23,127 @@ COUNTER = 2
 BINARY = 3
 MESSAGE = 4
 
+# string values of binary sensors
+BINARY_VALUES = {
+    'True': True,
+    'true': True,
+    'ON': True,
+    'On': True,
+    'on': True,
+    'OK': True,
+    'Yes': True,
+    'yes': True,
+    '1': True,
+    '1.0': True,
+    'False': False,
+    'false': False,
+    'OFF': False,
+    'Off': False,
+    'off': False,
+    'LOW': False,
+    'No': False,
+    'no': False,
+    '0': False,
+    '0.0': False,
+}
+
+# state attributes available as symbols in eval code
+EVAL_SYMBOLS = ('value', 'prev_value', 'hits_total', 'hit_timestamp', 'duration_seconds')
+
+
+# config attributes shared by a sensor and its clones
+CONFIG_FIELDS = ('node_addr', 'key', 'sensor_id', 'mode', 'default_value',
+                 'default_return_ttl', 'debounce_changed', 'debounce_time', 'debounce_hits',
+                 'debounce_dataset', 'debounce_value', 'ttl', 'eval_require', 'eval_code',
+                 'eval_skip_expired', 'eval_break_value', 'group', 'cron', 'desc', 'gw')
+
+# attributes of one sensor instance (export attributes depend on node_id)
+STATE_FIELDS = ('node_id', 'export_sensor_id', 'export_node_id', 'export_labels',
+                'export_hidden', 'export_prefix', 'parent_export', 'export', 'value',
+                'prev_value', 'hits_total', 'hit_timestamp', 'duration_seconds',
+                'dataset_ready', 'dataset_used', 'hold', 'debounce_hits_remaining',
+                'exp_timestamp', 'cron_jobs')
+
+# state attributes copied to a clone (the rest is set up per clone)
+CLONE_FIELDS = tuple(field for field in STATE_FIELDS
+                     if field not in ('node_id', 'export_node_id', 'export_labels',
+                                      'parent_export', 'export', 'exp_timestamp',
+                                      'cron_jobs'))
+
+# order of attributes in sensor data
+DATA_FIELDS = ('export_hidden', 'default_value', 'default_return_ttl', 'eval_skip_expired',
+               'node_addr', 'key', 'sensor_id', 'mode', 'ttl', 'group', 'cron', 'desc',
+               'node_id', 'gw', 'export_sensor_id', 'export_node_id', 'export_labels',
+               'export_prefix', 'debounce_changed', 'debounce_time', 'debounce_hits',
+               'debounce_dataset', 'debounce_value', 'eval_code', 'eval_require',
+               'eval_break_value', 'hits_total', 'value', 'prev_value', 'dataset_ready',
+               'dataset_used', 'debounce_hits_remaining', 'hit_timestamp',
+               'duration_seconds', 'hold', 'exp_timestamp', 'cron_jobs', 'parent_export',
+               'export')
+
+# attributes read as None when not set
+UNSET_AS_NONE = frozenset(CONFIG_FIELDS + STATE_FIELDS + ('config', 'journal', 'evaluator'))
+
+
+class SensorConfig():
+    '''
+    config of a sensor, shared by reference between a template and its clones
+    attributes not given in config are left unset
+    '''
+
+    __slots__ = CONFIG_FIELDS
+
 
 class Sensor(ABC):
-    '''abstract base class for Gauge, Counter, Binary and Message class'''
-
-    # config attributes:
-    node_addr = None
-    key = None
-    sensor_id = None
-    mode = None
-    default_value = None
-    default_return_ttl = None
-    debounce_changed = None
-    debounce_time = None
-    debounce_hits = None
-    debounce_dataset = None
-    debounce_value = None
-    ttl = None
-    export_sensor_id = None
-    export_node_id = None
-    export_labels = None
-    export_hidden = None
-    export_prefix = None
-    eval_require = None
-    eval_code = None
-    eval_skip_expired = None
-    eval_break_value = None
-    group = None  # not used
-    cron = None
-    desc = None  # not used
-    node_id = None
-    gw = None
-
-    # state attributes
-    value = None
-    prev_value = None
-    hits_total = None
-    hit_timestamp = None
-    duration_seconds = None
-    dataset_ready = None
-    dataset_used = None
-    hold = None
-    hit_timestamp = None
-    duration_seconds = None
-    hits_total = None
-    debounce_hits_remaining = None
-    parent_export = None
-    export = None
-    ttl_job = None
-    cron_jobs = None
+    '''
+    abstract base class for Gauge, Counter, Binary and Message class
+    config attributes are read from the (shared) config object,
+    attributes which were never set read as None and are not a part of sensor data
+    '''
+
+    __slots__ = STATE_FIELDS + (
+        'config',
+        'journal',  # change journal of the container (not a part of sensor data)
+        'evaluator',  # eval engine of the container (not a part of sensor data)
+    )
+
+    def __getattr__(self, name):
+        # called only if an attribute is not set
+        if name in UNSET_AS_NONE:
+            return None
+        raise AttributeError(name)
+
+    def init_config(self):
+        '''
+        create a new config object of the sensor
+        attributes of a former config (if any) are kept until overwritten
+        '''
+
+        config = SensorConfig()
+        if self.config is not None:
+            for field in CONFIG_FIELDS:
+                try:
+                    setattr(config, field, getattr(self.config, field))
+                except AttributeError:
+                    pass
+        self.config = config
+        return config
 
     def setup(self, sensor_id, node_addr, key, mode, default, debounce, ttl, export,
               parent_export, pyeval, group, cron, desc, node_id, gw):
         '''assign values to the data members of the class'''
 
-        self.node_addr = node_addr
-        self.key = key
-        self.sensor_id = sensor_id
-        self.mode = mode
-        self.ttl = ttl
-        self.group = group
-        self.cron = cron
-        self.desc = desc
+        config = self.config
+        config.node_addr = node_addr
+        config.key = key
+        config.sensor_id = sensor_id
+        config.mode = mode
+        config.ttl = ttl
+        config.group = group
+        config.cron = cron
+        config.desc = desc
         self.node_id = node_id
-        self.gw = gw
+        config.gw = gw
         self.export_sensor_id = sensor_id
         self.export_node_id = node_id
         self.export_labels = {}
@@ -142,53 +198,60 @@ class Sensor(ABC):
 
         if isinstance(debounce, dict):
             if 'changed' in debounce:
-                self.debounce_changed = debounce['changed']
+                self.config.debounce_changed = debounce['changed']
             if 'time' in debounce:
-                self.debounce_time = debounce['time']
+                self.config.debounce_time = debounce['time']
             if 'hits' in debounce:
-                self.debounce_hits = debounce['hits']
+                self.config.debounce_hits = debounce['hits']
             if 'dataset' in debounce:
-                self.debounce_dataset = debounce['dataset']
+                self.config.debounce_dataset = debounce['dataset']
             if 'value' in debounce:
-                self.debounce_value = debounce['value']
+                self.config.debounce_value = debounce['value']
 
     def __set_default(self, default):
         '''set default config related attributes'''
 
         if isinstance(default, dict):
             if 'value' in default:
-                self.default_value = default['value']
+                self.config.default_value = default['value']
             if 'default_return_ttl' in default:
-                self.default_return_ttl = default['default_return_ttl']
+                self.config.default_return_ttl = default['default_return_ttl']
 
     def __set_eval(self, pyeval):
         '''set eval related attributes'''
 
         if isinstance(pyeval, dict):
             if 'code' in pyeval:
-                self.eval_code = pyeval['code']
+                self.config.eval_code = pyeval['code']
             if 'require' in pyeval:
-                self.eval_require = pyeval['require']
+                self.config.eval_require = pyeval['require']
             if 'skip_expired' in pyeval:
-                self.eval_skip_expired = pyeval['skip_expired']
+                self.config.eval_skip_expired = pyeval['skip_expired']
             if 'break_value' in pyeval:
-                self.eval_break_value = pyeval['break_value']
+                self.config.eval_break_value = pyeval['break_value']
 
     def clone(self, new_node_id):
         '''
         clone sensor with a new node_id
         reset export attributes if sensor is a templete
+        config is shared by reference, only state attributes are copied
+        (scheduler jobs are not, they are added by the container)
         '''
 
-        ret = deepcopy(self)
+        ret = object.__new__(type(self))
+        ret.config = self.config
+        for name in CLONE_FIELDS:
+            try:
+                setattr(ret, name, object.__getattribute__(self, name))
+            except AttributeError:
+                pass
+        ret.export_labels = dict(self.export_labels)
         ret.node_id = new_node_id
         ret.export_node_id = new_node_id
 
         # if node is a template
         if isinstance(self.node_id, int):
-            ret.set_export(ret.export, ret.parent_export)
-            del ret.export
-            del ret.parent_export
+            ret.set_export(self.export, self.parent_export)
 
         return ret
 
@@ -199,35 +262,59 @@ class Sensor(ABC):
     def is_actuator(self):
         return self.mode == ACTUATOR
 
+    def notify_change(self, metric=None):
+        '''record a changed metric (None = all metrics) into the change journal'''
+
+        if self.journal is not None:
+            self.journal.record(self, metric)
+
+    def __get_fields(self, selected):
+        '''
+        yield (name, value) of attributes which have been set and the sensor type,
+        only selected ones if any are selected
+        '''
+
+        config = self.config
+        for key in DATA_FIELDS:
+            if selected and key not in selected:
+                continue
+            try:
+                if key in CONFIG_FIELDS:
+                    value = getattr(config, key)
+                else:
+                    value = object.__getattribute__(self, key)
+            except AttributeError:
+                continue
+            yield key, value
+        if not selected or 'type' in selected:
+            yield 'type', self.get_type()
+
     def get_data(self, skip_None=False, selected=None):
         if selected is None:
             # because {} is dangerous default value
             selected = {}
-        z = {**self.__dict__, **{'type': self.get_type()}}
-        for key, value in z.items():
-            if (not selected) or (key in selected):
-                if key == 'cron_jobs':
-                    next_ts = None
-                    if isinstance(value, list):
-                        for item in value:
-                            if isinstance(item, Job) and hasattr(item, 'next_run_time'):
-                                ts = datetime.timestamp(item.next_run_time)
-                                if not isinstance(next_ts, float):
-                                    next_ts = ts
-                                elif ts < next_ts:
-                                    next_ts = ts
-                    key = 'cron_timestamp'
-                    value = next_ts
-                if key == 'ttl_job':
-                    next_ts = None
-                    if isinstance(value, Job) and hasattr(value, 'next_run_time'):
-                        next_ts = datetime.timestamp(value.next_run_time)
-                    key = 'exp_timestamp'
-                    value = next_ts
-                if not (value is None and skip_None):
-                    yield key, value
+        for key, value in self.__get_fields(selected):
+            if key == 'cron_jobs':
+                next_ts = None
+                if isinstance(value, list):
+                    for item in value:
+                        if isinstance(item, Job) and hasattr(item, 'next_run_time'):
+                            ts = datetime.timestamp(item.next_run_time)
+                            if not isinstance(next_ts, float):
+                                next_ts = ts
+                            elif ts < next_ts:
+                                next_ts = ts
+                key = 'cron_timestamp'
+                value = next_ts
+            if not (value is None and skip_None):
+                yield key, value
+
+    def get_promexport_layout(self):
+        '''
+        get exported series of the sensor regardless of their values as
+        (name, type, attribute, label names, label values, prefix)
+        '''
 
-    def get_promexport_data(self):
         t = self.get_type()
         labels = []
         label_values = []
@@ -235,34 +322,40 @@ class Sensor(ABC):
             labels.append(label)
             label_values.append(label_value)
 
-        if self.value is not None:
-            yield self.export_sensor_id, t, self.value, ['node'] + labels, [
-                self.export_node_id
-            ] + label_values, self.export_prefix
-        if self.hits_total is not None:
-            yield 'hits_total', COUNTER, self.hits_total, ['node', 'sensor'] + labels, [
-                self.export_node_id, self.export_sensor_id
-            ] + label_values, self.export_prefix
-        if self.duration_seconds is not None:
-            yield 'duration_seconds', COUNTER, self.duration_seconds, [
-                'node', 'sensor'
-            ] + labels, [self.export_node_id, self.export_sensor_id
-                         ] + label_values, self.export_prefix
+        yield self.export_sensor_id, t, 'value', ['node'] + labels, [
+            self.export_node_id
+        ] + label_values, self.export_prefix
+        yield 'hits_total', COUNTER, 'hits_total', ['node', 'sensor'] + labels, [
+            self.export_node_id, self.export_sensor_id
+        ] + label_values, self.export_prefix
+        yield 'duration_seconds', COUNTER, 'duration_seconds', [
+            'node', 'sensor'
+        ] + labels, [self.export_node_id, self.export_sensor_id
+                     ] + label_values, self.export_prefix
+
+    def get_promexport_data(self):
+        for (name, t, attr, labels, label_values,
+             prefix) in self.get_promexport_layout():
+            value = getattr(self, attr)
+            if value is not None:
+                yield name, t, value, labels, label_values, prefix
 
     def sensor_reset(self):
         changed = False
         if self.value != self.default_value:
             self.value = self.default_value
+            self.notify_change('value')
             changed = True
 
         self.dataset_ready = False
         self.dataset_used = False
         self.debounce_hits_remaining = 0
-        if isinstance(self.ttl_job, Job):
-            logging.debug("scheduler: remove TTL job for %s.%s", self.node_id,
+        if self.exp_timestamp is not None:
+            # a deadline left in the expiry wheel is skipped when it elapses
+            logging.debug("scheduler: remove TTL deadline of %s.%s", self.node_id,
                           self.sensor_id)
-            self.ttl_job.remove()
-            self.ttl_job = None
+            self.exp_timestamp = None
+            self.notify_change('exp_timestamp')
         return changed
 
     @abstractmethod
@@ -282,7 +375,10 @@ class Sensor(ABC):
         timestamp = time()
         if self.hit_timestamp is not None:
             self.duration_seconds = timestamp - self.hit_timestamp
+            self.notify_change('duration_seconds')
         self.hit_timestamp = timestamp
+        self.notify_change('hits_total')
+        self.notify_change('hit_timestamp')
 
     def set(self, value, update=True, increment=False):
 
@@ -291,7 +387,7 @@ class Sensor(ABC):
 
         try:
             value = self.fix_value(value)
-        except ValueError as exc:
+        except (ValueError, TypeError) as exc:  # e.g. None, list or dict from JSON
             logging.error("%s.%s %s", self.node_id, self.sensor_id, exc)
             return False
 
@@ -328,6 +424,7 @@ class Sensor(ABC):
             self.prev_value = self.value
 
         self.value = value
+        self.notify_change('value')
 
         if update:  # update metadata
             self.count_hit()
@@ -335,7 +432,7 @@ class Sensor(ABC):
             if self.debounce_dataset:
                 self.dataset_ready = True
 
-            if isinstance(self.ttl_job, Job) and (
+            if self.exp_timestamp is not None and (
                     self.value == self.default_value) and not self.default_return_ttl:
                 self.sensor_reset()
 
@@ -355,32 +452,25 @@ class Sensor(ABC):
         if self.eval_require is not None and not vars_dict:
             return False
 
-        class Devnull():
-            def write(self, *_):
+        symbols = {**vars_dict, 'origin': origin_list}
+        for key in EVAL_SYMBOLS:
+            try:
+                symbols[key] = object.__getattribute__(self, key)
+            except AttributeError:  # not set
                 pass
 
-        syms = make_symbol_table(
-            use_numpy=True,
-            **vars_dict,
-            **{"origin": origin_list},
-            **dict(
-                self.get_data(selected={
-                    'value', 'prev_value', 'hits_total', 'hit_timestamp',
-                    'duration_seconds'
-                })),
-            re=re)
-
-        aeval = Interpreter(writer=Devnull(), err_writer=Devnull(), symtable=syms)
+        if self.evaluator is None:
+            self.evaluator = EvalEngine()
 
-        result = aeval.eval(self.eval_code)
+        result, errors = self.evaluator.eval(self.eval_code, symbols)
 
         if result is not None:
             logging.debug("%s.%s = %s", self.node_id, self.sensor_id, result)
             return self.set(result, update=update)
 
-        if len(aeval.error) > 0:
+        if len(errors) > 0:
             logging.error("%s.%s: eval ERROR", self.node_id, self.sensor_id)
-            for err in aeval.error:
+            for err in errors:
                 logging.error(err.get_error())
         else:
             logging.debug("%s.%s: no result", self.node_id, self.sensor_id)
@@ -400,11 +490,19 @@ class Sensor(ABC):
         self.hold = not release
 
 
+# read config attributes of a sensor from its config object
+for _field in CONFIG_FIELDS:
+    setattr(Sensor, _field, property(attrgetter('config.' + _field)))
+
+
 class Gauge(Sensor):
     '''An object that collects state and metadata of the Gauge sensor.
        A gauge is a metric that represents a single numerical value
        that can arbitrarily go up and down.
     '''
+
+    __slots__ = ()
+
     def get_type(self):
         return GAUGE
 
@@ -432,9 +530,10 @@ class Gauge(Sensor):
                  gw=None):
 
         self.export_hidden = False
-        self.default_value = None
-        self.default_return_ttl = True
-        self.eval_skip_expired = True
+        config = self.init_config()
+        config.default_value = None
+        config.default_return_ttl = True
+        config.eval_skip_expired = True
 
         self.setup(sensor_id, node_addr, key, mode, default, debounce, ttl, export,
                    parent_export, pyeval, group, cron, desc, node_id, gw)
@@ -448,6 +547,9 @@ class Counter(Sensor):
        A counter is a cumulative metric that represents a single monotonically
        increasing counter whose value can only increase or be reset to zero.
     '''
+
+    __slots__ = ()
+
     def get_type(self):
         return COUNTER
 
@@ -475,9 +577,10 @@ class Counter(Sensor):
                  gw=None):
 
         self.export_hidden = False
-        self.default_value = None
-        self.default_return_ttl = True
-        self.eval_skip_expired = True
+        config = self.init_config()
+        config.default_value = None
+        config.default_return_ttl = True
+        config.eval_skip_expired = True
 
         self.setup(sensor_id, node_addr, key, mode, default, debounce, ttl, export,
                    parent_export, pyeval, group, cron, desc, node_id, gw)
@@ -491,6 +594,9 @@ class Binary(Sensor):
        The binary is a metric that represents a single boolean
        value On/Off (True/False).
     '''
+
+    __slots__ = ()
+
     def get_type(self):
         return BINARY
 
@@ -499,32 +605,9 @@ class Binary(Sensor):
         return self.sensor_reset()
 
     def fix_value(self, value: Any) -> bool:
-        values_map = {
-            'True': True,
-            'true': True,
-            'ON': True,
-            'On': True,
-            'on': True,
-            'OK': True,
-            'Yes': True,
-            'yes': True,
-            '1': True,
-            '1.0': True,
-            'False': False,
-            'false': False,
-            'OFF': False,
-            'Off': False,
-            'off': False,
-            'LOW': False,
-            'No': False,
-            'no': False,
-            '0': False,
-            '0.0': False,
-        }
-
         if isinstance(value, str):
             try:
-                ret = values_map[value]
+                ret = BINARY_VALUES[value]
             except KeyError:
                 # any other string causes True
                 ret = True
@@ -551,9 +634,10 @@ class Binary(Sensor):
                  gw=None):
 
         self.export_hidden = False
-        self.default_value = False
-        self.default_return_ttl = False
-        self.eval_skip_expired = False
+        config = self.init_config()
+        config.default_value = False
+        config.default_return_ttl = False
+        config.eval_skip_expired = False
 
         self.setup(sensor_id, node_addr, key, mode, default, debounce, ttl, export,
                    parent_export, pyeval, group, cron, desc, node_id, gw)
@@ -571,6 +655,9 @@ class Message(Sensor):
        This is not a metric but represents a text string that can be displayed
        or parsed to metric.
     '''
+
+    __slots__ = ()
+
     def get_type(self):
         return MESSAGE
 
@@ -598,9 +685,10 @@ class Message(Sensor):
                  gw=None):
 
         self.export_hidden = True
-        self.default_value = ""
-        self.default_return_ttl = True
-        self.eval_skip_expired = True
+        config = self.init_config()
+        config.default_value = ""
+        config.default_return_ttl = True
+        config.eval_skip_expired = True
 
         self.setup(sensor_id, node_addr, key, mode, default, debounce, ttl, export,
                    parent_export, pyeval, group, cron, desc, node_id, gw)
@@ -5,15 +5,31 @@ Object that contains sets of sensors
 
 import logging
 import json
-import hashlib
-from time import time
-from datetime import datetime, timedelta
+import uuid
+from time import time, perf_counter
+from operator import attrgetter, itemgetter
 from jinja2 import (Environment, FileSystemLoader, TemplateSyntaxError, TemplateNotFound)
-from yaml import safe_load, YAMLError
-from apscheduler.triggers.date import DateTrigger
+from yaml import load, YAMLError
+try:
+    # libyaml based loader is much faster on large configs
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.jobstores.base import JobLookupError
 from laporte.version import __version__
 from laporte.app import event_id
+from laporte.app.ringbuf import RingBuffer
+from laporte.metrics import metrics as prometheus_metrics
+from laporte.metrics.common import pipeline_stage_metric, pipeline_stage_buckets
+from laporte.core.journal import ChangeJournal
+from laporte.core.depgraph import DependencyGraph
+from laporte.core.evaluator import EvalEngine
+from laporte.core.expiry import ExpiryWheel, TTL_RESOLUTION
+from laporte.core.snapshot import StateStore, STATE_ATTRS
+from laporte.core.subscription import Subscriptions, ALL_EVENTS_ROOM
+from laporte.core.encoding import EncodedRooms, JSON, encode, get_room
+from laporte.core.window import EmitWindow
 from laporte.core.sensor import (Gauge, Counter, Binary, Message, SENSOR, ACTUATOR,
                                  GAUGE, COUNTER, BINARY)
 
@@ -24,11 +40,19 @@ METRICS_NAMESPACE = '/metrics'
 EVENTS_NAMESPACE = '/events'
 
 METRICS = {
-    'value', 'hits_total', 'hit_timestamp', 'duration_seconds', 'ttl_job', 'cron_jobs'
+    'value', 'hits_total', 'hit_timestamp', 'duration_seconds', 'exp_timestamp', 'cron_jobs'
 }
 SETUP = {'sensor_id', 'node_id', 'mode', 'node_addr', 'key'}
 
 MAX_EVENTBUF_ITEMS = 2048
+MAX_EVAL_LEVEL = 8
+STATE_SNAPSHOT_INTERVAL = 300
+STATE_SNAPSHOT_JOB_ID = 'state_snapshot'
+
+# stages of the update pipeline with own duration histograms
+# set and eval are measured per sensor, the others per update
+PIPELINE_STAGES = ('set', 'eval', 'requiring_eval', 'diff', 'ttl', 'state_log',
+                   'serialize', 'emit')
 
 
 class Sensors():
@@ -38,9 +62,54 @@ class Sensors():
         self.node_template_index = {}
         self.sensor_template_index = {}
         self.sensor_index = []
-        self.diff_buf = []
-
-    def __init__(self, app, sio, scheduler):
+        self.addr_index = {}
+        self.sensor_specs = {}
+        self.template_specs = {}
+        self.template_nodes = {}
+        self.__remove_cron_jobs()
+        self.diff_buf = RingBuffer(self.history_items, self.history_bytes)
+        self.init_msg = (None, None, {})
+        self.hist_msg = (None, {})
+        self.used_dataset_sensors = set()
+        self.eval_costs = {}
+        self.journal.reset()
+        self.depgraph.reset()
+        self.evaluator.reset()
+        self.expiry.reset()
+        self.event_window.reset()
+        self.actuator_window.reset()
+
+    def __init__(self,
+                 app,
+                 sio,
+                 scheduler,
+                 history_items=MAX_EVENTBUF_ITEMS,
+                 history_bytes=None,
+                 ttl_resolution=TTL_RESOLUTION,
+                 state_file=None,
+                 state_interval=STATE_SNAPSHOT_INTERVAL,
+                 emit_window=0,
+                 actuator_emit_window=0):
+        self.history_items = history_items
+        self.history_bytes = history_bytes
+        self.run_id = uuid.uuid4().hex[0:16]
+        self.journal = ChangeJournal()
+        self.depgraph = DependencyGraph()
+        self.evaluator = EvalEngine()
+        self.expiry = ExpiryWheel(scheduler, self.sensors_expire, ttl_resolution)
+        self.cron_groups = {}
+        # unique ids of cron jobs (not reset, jobs are replaced by id)
+        self.cron_job_cnt = 0
+        self.subscriptions = Subscriptions()
+        self.gateway_rooms = EncodedRooms()
+        self.event_window = EmitWindow(sio, self.__emit_event, emit_window)
+        self.actuator_window = EmitWindow(sio, self.__emit_actuators, actuator_emit_window)
+        self.stages = {
+            stage: prometheus_metrics.get_histogram(**pipeline_stage_metric,
+                                                    labels={'stage': stage},
+                                                    buckets=pipeline_stage_buckets)
+            for stage in PIPELINE_STAGES
+        }
         self.reset()
         self.sio = sio
         self.scheduler = None
@@ -48,6 +117,16 @@ class Sensors():
         self.app = app
         self.scheduler = scheduler
 
+        self.state_store = None
+        if state_file:
+            self.state_store = StateStore(state_file)
+            if state_interval:
+                self.scheduler.add_job(func=self.save_state,
+                                       trigger='interval',
+                                       seconds=state_interval,
+                                       id=STATE_SNAPSHOT_JOB_ID,
+                                       replace_existing=True)
+
     def __add_sensor(self,
                      gw,
                      node_id,
@@ -100,89 +179,123 @@ class Sensors():
         else:
             sensor = Gauge(**param)
 
+        spec = (gw, node_addr, mode, sensor_config_dict, sensor_parent_config_dict)
+
         if not template:
             self.sensor_index.append(sensor)
-            self.node_id_index[node_id][sensor_id] = sensor
-            self.__add_cron_jobs(sensor)
+            self.node_id_index.setdefault(node_id, {})[sensor_id] = sensor
+            self.sensor_specs[(node_id, sensor_id)] = ('config', ) + spec
+            self.addr_index.setdefault((sensor.node_addr, sensor.key), sensor)
+            self.journal.track(sensor, node_id, sensor_id)
+            self.depgraph.add(node_id, sensor_id, sensor.eval_require)
+            self.__add_evaluator(sensor)
+            self.__add_cron_jobs([sensor])
         else:
-            self.node_template_index[node_id][sensor_id] = sensor
+            self.node_template_index.setdefault(node_id, {})[sensor_id] = sensor
             self.sensor_template_index[sensor_id] = node_id
+            self.template_specs[(node_id, sensor_id)] = spec
+            self.__add_evaluator(sensor)
 
-    def __add_node(self, node_id, gw, node_config_dict, template=False):
-        '''set up node and its sensors'''
+        return sensor
 
-        if 'addr' in node_config_dict and not template:
-            node_addr = node_config_dict['addr']
-        else:
-            node_addr = None
+    @staticmethod
+    def __iter_sensor_configs(config_dict):
+        '''
+        yield (gw, node_id, node_addr, sensor_id, sensor_config_dict,
+        sensor_parent_config_dict, template, mode) of all sensors in config
+        '''
 
-        if not template:
-            if node_id not in self.node_id_index:
-                self.node_id_index[node_id] = {}
-        else:
-            if node_id not in self.node_template_index:
-                self.node_template_index[node_id] = {}
-
-        sensor_parent_config_dict = {}
-
-        for key in ['export', 'ttl']:
-            if key in node_config_dict:
-                sensor_parent_config_dict[key] = node_config_dict[key]
-
-        for key, mode in {'sensors': SENSOR, 'actuators': ACTUATOR}.items():
-            if key in node_config_dict:
-                for sensor_id, sensor_config_dict in node_config_dict[key].items():
-                    self.__add_sensor(gw,
-                                      node_id,
-                                      node_addr,
-                                      sensor_id,
-                                      sensor_config_dict,
-                                      sensor_parent_config_dict,
-                                      template=template,
-                                      mode=mode)
-
-    def __add_gw(self, gw, gw_config_dict):
-        for node_id, node_config_dict in gw_config_dict.items():
-            if isinstance(node_id, int):
-                self.__add_node(node_id, gw, node_config_dict, template=True)
-            else:
-                self.__add_node(node_id, gw, node_config_dict)
+        for gw, gw_config_dict in config_dict.items():
+            for node_id, node_config_dict in gw_config_dict.items():
+                template = isinstance(node_id, int)
+
+                if 'addr' in node_config_dict and not template:
+                    node_addr = node_config_dict['addr']
+                else:
+                    node_addr = None
+
+                sensor_parent_config_dict = {}
+
+                for key in ['export', 'ttl']:
+                    if key in node_config_dict:
+                        sensor_parent_config_dict[key] = node_config_dict[key]
+
+                for key, mode in {'sensors': SENSOR, 'actuators': ACTUATOR}.items():
+                    if key in node_config_dict:
+                        for sensor_id, sensor_config_dict in node_config_dict[key].items():
+                            yield (gw, node_id, node_addr, sensor_id, sensor_config_dict,
+                                   sensor_parent_config_dict, template, mode)
 
     def add_sensors(self, config_dict):
-        for gw, gw_config_dict in config_dict.items():
-            self.__add_gw(gw, gw_config_dict)
+        for sensor_config in self.__iter_sensor_configs(config_dict):
+            self.__add_sensor(*sensor_config)
         self.prev_data = {}
 
-    def __add_cron_jobs(self, sensor):
-        if isinstance(sensor.cron, dict):
+    def __add_evaluator(self, sensor):
+        '''attach the shared eval engine to a sensor and parse its eval code'''
+
+        sensor.evaluator = self.evaluator
+        self.evaluator.compile(sensor.eval_code)
+
+    def __get_cron_group(self, cron_str):
+        '''
+        get (job, [(sensor, value)]) of a cron string
+        sensors with the same cron string share one job, so they are updated at once
+        '''
+
+        if cron_str not in self.cron_groups:
+            cron_items = cron_str.split()
+            if len(cron_items) == 6:
+                (second, minute, hour, day, month, day_of_week) = cron_items
+            elif len(cron_items) == 5:
+                second = '0'
+                (minute, hour, day, month, day_of_week) = cron_items
+            else:
+                raise TypeError
+
+            self.cron_job_cnt += 1
+            job_id = f'cron_{self.cron_job_cnt:06x}'
+
+            job = self.scheduler.add_job(func=self.sensors_cron_trigger,
+                                         trigger=CronTrigger(month=month,
+                                                             day=day,
+                                                             day_of_week=day_of_week,
+                                                             hour=hour,
+                                                             minute=minute,
+                                                             second=second),
+                                         id=job_id,
+                                         args=[cron_str, job_id],
+                                         replace_existing=True)
+            logging.debug("scheduler: add %s", job)
+            self.cron_groups[cron_str] = (job, [])
+
+        return self.cron_groups[cron_str]
+
+    def __add_cron_jobs(self, sensor_list):
+        '''add given sensors to jobs of their cron strings'''
+
+        for sensor in sensor_list:
+            if not isinstance(sensor.cron, dict):
+                continue
+
             for cron_str, value in sensor.cron.items():
-                cron_items = cron_str.split()
-                if len(cron_items) == 6:
-                    (second, minute, hour, day, month, day_of_week) = cron_items
-                elif len(cron_items) == 5:
-                    second = '0'
-                    (minute, hour, day, month, day_of_week) = cron_items
-                else:
-                    raise TypeError
-
-                job_id = (f"cron_{sensor.node_id}."
-                          f"{sensor.sensor_id}_"
-                          f"{hashlib.sha256(cron_str.encode('utf-8')).hexdigest()[0:6]}")
-
-                job = self.scheduler.add_job(func=self.sensor_cron_trigger,
-                                             trigger=CronTrigger(month=month,
-                                                                 day=day,
-                                                                 day_of_week=day_of_week,
-                                                                 hour=hour,
-                                                                 minute=minute,
-                                                                 second=second),
-                                             id=job_id,
-                                             args=[sensor, value, job_id])
-                logging.debug("scheduler: add %s", job)
+                (job, members) = self.__get_cron_group(cron_str)
+                members.append((sensor, value))
                 if not isinstance(sensor.cron_jobs, list):
                     sensor.cron_jobs = [job]
                 else:
                     sensor.cron_jobs.append(job)
+                sensor.notify_change('cron_jobs')
+
+    def __remove_cron_jobs(self):
+        '''remove jobs of all cron strings'''
+
+        for job, _ in self.cron_groups.values():
+            try:
+                job.remove()
+            except JobLookupError:
+                pass
+        self.cron_groups = {}
 
     def __get_sensor(self, node_id, sensor_id):
         return self.node_id_index[node_id][sensor_id]
@@ -190,10 +303,7 @@ class Sensors():
     def __find_addr(self, node_addr, key):
         '''return a sensor with given node_addr and key'''
 
-        for sensor in self.sensor_index:
-            if (sensor.node_addr == node_addr) and (sensor.key == key):
-                return sensor
-        return None
+        return self.addr_index.get((node_addr, key))
 
     def get_metrics_of_sensor(self, node_id, sensor_id):
         sensor = self.__get_sensor(node_id, sensor_id)
@@ -211,14 +321,16 @@ class Sensors():
 
     def get_metrics_dict_by_gw(self, skip_None=True):
         ret = {}
-        for node_id, sensor_id, data in self.get_metrics(skip_None=skip_None):
-            gw = self.__get_sensor(node_id, sensor_id).gw
-            if gw not in ret:
-                ret[gw] = {}
-            if node_id not in ret[gw]:
-                ret[gw][node_id] = {}
-            if sensor_id not in ret[gw][node_id]:
-                ret[gw][node_id][sensor_id] = data
+        for node_id, sensors in self.node_id_index.items():
+            for sensor_id, sensor in sensors.items():
+                gw = sensor.gw
+                if gw not in ret:
+                    ret[gw] = {}
+                if node_id not in ret[gw]:
+                    ret[gw][node_id] = {}
+                if sensor_id not in ret[gw][node_id]:
+                    ret[gw][node_id][sensor_id] = dict(
+                        sensor.get_data(skip_None=skip_None, selected=METRICS))
         return ret
 
     def get_metrics_dict_by_node(self, skip_None=True):
@@ -230,6 +342,76 @@ class Sensors():
                 ret[node_id][sensor_id] = data
         return ret
 
+    def get_stream_id(self):
+        '''
+        identification of the stream of event sequence numbers, it changes
+        upon restart, reset and removal of sensors
+        '''
+
+        return f'{self.run_id}.{self.journal.epoch}'
+
+    def get_init_msg(self, event_filter=None, encoding=JSON):
+        '''
+        get message with all metrics of all nodes with position in the event stream,
+        serialized once per change and encoding and shared by all clients connected
+        meanwhile (the filtered one is serialized for each client)
+        '''
+
+        key = (self.journal.epoch, self.journal.generation, self.diff_buf.last_seq)
+        if self.init_msg[0] != key:
+            init_resp = {
+                'stream': self.get_stream_id(),
+                'seq': self.diff_buf.last_seq,
+                'data': self.get_metrics_dict_by_node(skip_None=False)
+            }
+            self.init_msg = (key, init_resp, {})
+
+        init_resp = self.init_msg[1]
+        if event_filter is not None:
+            return encode(
+                dict(init_resp, data=event_filter.apply(init_resp['data'],
+                                                        self.node_id_index)), encoding)
+
+        msgs = self.init_msg[2]
+        if encoding not in msgs:
+            msgs[encoding] = encode(init_resp, encoding)
+        return msgs[encoding]
+
+    def get_hist_msg(self, event_filter=None, encoding=JSON):
+        '''
+        get message with the whole event history,
+        serialized once per new event and encoding
+        '''
+
+        if event_filter is not None:
+            return encode(event_filter.apply_events(self.diff_buf, self.node_id_index),
+                          encoding)
+
+        key = (self.journal.epoch, self.diff_buf.last_seq)
+        if self.hist_msg[0] != key:
+            self.hist_msg = (key, {})
+
+        msgs = self.hist_msg[1]
+        if encoding not in msgs:
+            msgs[encoding] = encode(self.diff_buf.since(), encoding)
+        return msgs[encoding]
+
+    def get_missed_events(self, stream, since, event_filter=None):
+        '''
+        get events of the stream appended after the sequence number since,
+        None if they can not be replayed - the stream has changed or
+        some of the events have already been dropped from history
+        '''
+
+        if stream != self.get_stream_id() or not isinstance(since, int):
+            return None
+        if since > self.diff_buf.last_seq or since < self.diff_buf.first_seq() - 1:
+            return None
+        if event_filter is not None:
+            return event_filter.apply_events(self.diff_buf.since(since),
+                                             self.node_id_index)
+        return self.diff_buf.since(since)
+
     def get_metrics_dict_by_sensor(self, skip_None=True):
         ret = {}
         for node_id, sensor_id, data in self.get_metrics(skip_None=skip_None):
@@ -256,38 +438,43 @@ class Sensors():
             if sensor.gw == gw:
                 yield dict(sensor.get_data(skip_None=True, selected=SETUP))
 
-    def __get_changed_nodes_dict(self, first=None, second=None, level=0):
-        changed = {}
-
-        # because {} is dangerous default value
-        if first is None:
-            first = {}
-        if second is None:
-            second = {}
-
-        if level == 0:
-            first = self.prev_data
-            second = self.get_metrics_dict_by_node(skip_None=False)
-
-        for key in first:
-            if first[key] != second[key]:  # changed
-                if level < 2:
-                    changed[key] = self.__get_changed_nodes_dict(first=first[key],
-                                                                 second=second[key],
-                                                                 level=level + 1)
-                else:
-                    changed[key] = second[key]
+    def __get_changed_nodes_dict(self):
+        '''
+        get metrics changed since the last call, as {node_id:{sensor_id:{metric:value}}}
+        only sensors recorded in the change journal are compared with previous data
+        '''
 
-        for key in second:
-            if key not in first:  # added
-                if level < 2:
-                    changed[key] = self.__get_changed_nodes_dict(second=second[key],
-                                                                 level=level + 1)
-                else:
-                    changed[key] = second[key]
+        changed = {}
 
-        if level == 0:
-            self.prev_data = second
+        for node_id, sensor_id, sensor, metrics in self.journal.pop():
+            if node_id not in self.prev_data:
+                self.prev_data[node_id] = {}
+            prev_node = self.prev_data[node_id]
+
+            if sensor_id not in prev_node:  # added
+                second = dict(sensor.get_data(skip_None=False, selected=METRICS))
+                prev_node[sensor_id] = second
+                if node_id not in changed:
+                    changed[node_id] = {}
+                changed[node_id][sensor_id] = dict(second)
+                continue
+
+            if metrics is None:
+                metrics = METRICS
+
+            first = prev_node[sensor_id]
+            second = dict(sensor.get_data(skip_None=False, selected=metrics))
+            metrics_changed = {
+                key: value
+                for key, value in second.items()
+                if key not in first or first[key] != value
+            }
+
+            if metrics_changed:
+                first.update(second)
+                if node_id not in changed:
+                    changed[node_id] = {}
+                changed[node_id][sensor_id] = metrics_changed
 
         return changed
 
@@ -295,126 +482,241 @@ class Sensors():
         ret = {}
         used_list = []
 
-        if sensor.eval_require is not None:
+        requires = self.depgraph.get_requires(sensor.node_id, sensor.sensor_id)
+        if requires is None:
+            logging.error("%s.%s: error in eval_require config %s", sensor.node_id,
+                          sensor.sensor_id, sensor.eval_require)
+            return {}
+
+        for (var, node_id, sensor_id, metric_name) in requires:
             try:
-                for var, metric_list in sensor.eval_require.items():
-                    if len(metric_list) == 3:
-                        (node_id, sensor_id, metric_name) = tuple(metric_list)
-                    elif len(metric_list) == 2:
-                        (sensor_id, metric_name) = tuple(metric_list)
-                        node_id = sensor.node_id
-                    else:
-                        logging.error("%s.%s: error in eval_require config %s", node_id,
-                                      sensor_id, sensor.eval_require)
-                        return {}
-
-                    search_sensor = self.__get_sensor(node_id, sensor_id)
-
-                    if search_sensor.debounce_dataset and not search_sensor.dataset_ready:
-                        logging.debug("%s.%s skip eval: %s.%s not ready in dataset",
-                                      sensor.node_id, sensor.sensor_id,
-                                      search_sensor.node_id, search_sensor.sensor_id)
-                        return {}
-
-                    value = next(search_sensor.get_data(selected={metric_name}))[1]
-
-                    if value is not None:
-                        ret[var] = value
-                        used_list.append(self.__get_sensor(node_id, sensor_id))
-                    else:
-                        return {}
+                search_sensor = self.__get_sensor(node_id, sensor_id)
             except KeyError:
                 logging.debug("%s.%s skip eval: required sensor %s.%s not found",
                               sensor.node_id, sensor.sensor_id, node_id, sensor_id)
                 return {}
+
+            if search_sensor.debounce_dataset and not search_sensor.dataset_ready:
+                logging.debug("%s.%s skip eval: %s.%s not ready in dataset",
+                              sensor.node_id, sensor.sensor_id, search_sensor.node_id,
+                              search_sensor.sensor_id)
+                return {}
+
+            try:
+                value = next(search_sensor.get_data(selected={metric_name}))[1]
             except StopIteration:
                 logging.debug("%s.%s skip eval: required metric %s of %s.%s not found",
                               sensor.node_id, sensor.sensor_id, metric_name, node_id,
                               sensor_id)
                 return {}
 
+            if value is not None:
+                ret[var] = value
+                used_list.append(search_sensor)
+            else:
+                return {}
+
         for s in used_list:
             s.dataset_use()
+            if s.dataset_used:
+                self.used_dataset_sensors.add(s)
 
         return ret
 
-    def __get_requiring_sensors(self, sensor):
-        x = set()
-
-        for s in self.sensor_index:
-            if s.eval_require is not None:
-                for _, metric_list in s.eval_require.items():
-                    if len(metric_list) == 3:
-                        (node_id, sensor_id,
-                         _) = tuple(metric_list)  # unused metric_name
-                    elif len(metric_list) == 2:
-                        (sensor_id, _) = tuple(metric_list)  # unused metric_name
-                        node_id = s.node_id
-
-                    if node_id == sensor.node_id and sensor_id == sensor.sensor_id and s not in x:
-                        x.add(s)
-                        yield s
-
-    def __do_requiring_eval(self, sensor, level=0, origin_sensors=None):
-        if (level < 8) and (sensor.value != sensor.eval_break_value):
-            for req_sensor in self.__get_requiring_sensors(sensor):
-                vars_dict = self.__get_sensor_required_vars(req_sensor)
-
-                if not isinstance(origin_sensors, list):
-                    new_origin_sensors = [(sensor.node_id, sensor.sensor_id)]
-                else:
-                    new_origin_sensors = origin_sensors + [
-                        (sensor.node_id, sensor.sensor_id)
-                    ]
+    def __do_requiring_eval(self, changed_sensors):
+        '''
+        evaluate sensors requiring changed sensors (and their dependents)
+        in topological order, so each sensor is evaluated at most once
+        '''
+
+        # (node_id, sensor_id) of changed sensors: (level, origin sensors)
+        changed = {}
+        for sensor in changed_sensors:
+            changed[(sensor.node_id, sensor.sensor_id)] = (0, [])
+
+        for key in self.depgraph.topological_order(list(changed)):
+            trigger = None
+            for (_, node_id, sensor_id, _) in self.depgraph.get_requires(*key) or []:
+                req_key = (node_id, sensor_id)
+                if req_key in changed and changed[req_key][0] < MAX_EVAL_LEVEL:
+                    req_sensor = self.__get_sensor(node_id, sensor_id)
+                    if req_sensor.value != req_sensor.eval_break_value:
+                        trigger = req_key
+                        break
+
+            if trigger is None:
+                continue
+
+            (level, origin_sensors) = changed[trigger]
+            new_origin_sensors = origin_sensors + [trigger]
+            sensor = self.__get_sensor(*key)
+            vars_dict = self.__get_sensor_required_vars(sensor)
+
+            if self.__eval_sensor(sensor, vars_dict, origin_list=new_origin_sensors):
+                changed[key] = (level + 1, new_origin_sensors)
+
+    def __observe(self, stage, start_t):
+        '''add duration of a pipeline stage started at start_t (perf_counter)'''
+
+        prometheus_metrics.observe(self.stages[stage], perf_counter() - start_t)
+
+    def __eval_sensor(self, sensor, vars_dict, origin_list=None, update=True):
+        '''do eval of a sensor and add its duration to eval costs of the sensor'''
+
+        start_t = perf_counter()
+        ret = sensor.do_eval(vars_dict=vars_dict, origin_list=origin_list, update=update)
+        duration = perf_counter() - start_t
+
+        cost = self.eval_costs.get(sensor)
+        if cost is None:
+            cost = self.eval_costs[sensor] = [0, 0.0]
+        cost[0] += 1
+        cost[1] += duration
+        return ret
+
+    def get_eval_costs(self, top=0):
+        '''
+        get [(sensor, number of evals, total duration of evals)]
+        sorted from the most expensive, only top ones if top > 0
+        '''
 
-                if req_sensor.do_eval(vars_dict=vars_dict,
-                                      origin_list=new_origin_sensors):
-                    self.__do_requiring_eval(req_sensor,
-                                             level=level + 1,
-                                             origin_sensors=new_origin_sensors)
+        costs = sorted(((sensor, evals, seconds)
+                        for sensor, (evals, seconds) in self.eval_costs.items()),
+                       key=itemgetter(2),
+                       reverse=True)
+        return costs[0:top] if top > 0 else costs
 
     def __used_dataset_reset(self):
-        for s in self.sensor_index:
+        for s in self.used_dataset_sensors:
             if s.dataset_used:
                 s.dataset_reset()
+        self.used_dataset_sensors = set()
 
-    def sensor_cron_trigger(self, sensor, value, eid):
+    def sensors_cron_trigger(self, cron_str, eid):
         '''
-        called from scheduler when cron time has come
+        called from scheduler when cron time has come,
+        all sensors with the cron string are updated at once
         '''
 
         with self.app.app_context():
             event_id.set(eid=eid)
 
-            logging.info("%s.%s update triggered: cron time has come", sensor.node_id,
-                         sensor.sensor_id)
+            if cron_str not in self.cron_groups:
+                return
+            (_, members) = self.cron_groups[cron_str]
 
-            # set the same value if None / null
-            if value is None:
-                x = sensor.value
-            else:
-                x = value
+            nodes = {}
+            for sensor, value in members:
+                logging.info("%s.%s update triggered: cron time has come", sensor.node_id,
+                             sensor.sensor_id)
+
+                # next run time of cron jobs has changed
+                sensor.notify_change('cron_jobs')
+
+                # set the same value if None / null
+                if value is None:
+                    x = sensor.value
+                else:
+                    x = value
 
-            self.set_node_values(sensor.node_id, {sensor.sensor_id: x})
+                if sensor.node_id not in nodes:
+                    nodes[sensor.node_id] = {}
+                nodes[sensor.node_id][sensor.sensor_id] = x
 
-    def sensor_expire(self, sensor, eid):
+            self.set_nodes_values(nodes)
+
+    def sensors_expire(self, expired):
         '''
-        called from scheduler job when TTL expires
+        called from the expiry wheel when TTL of sensors expires
+        expired is a list of (sensor, event ID which set the TTL)
         '''
 
         with self.app.app_context():
-            event_id.set(eid=eid)
+            event_id.set(add_prefix='ttl_')
+
+            sensor_list = []
+            for sensor, eid in expired:
+                if sensor.exp_timestamp is None:
+                    # TTL ended by a sensor reset in the meantime
+                    continue
+
+                logging.info("%s.%s update triggered: TTL=%d expired (event %s)",
+                             sensor.node_id, sensor.sensor_id, sensor.ttl, eid)
+
+                sensor.exp_timestamp = None
+                sensor.notify_change('exp_timestamp')
+                sensor_list.append(sensor)
 
-            logging.info("%s.%s update triggered: TTL=%d expired", sensor.node_id,
-                         sensor.sensor_id, sensor.ttl)
+            if sensor_list:
+                self.__reset_sensors(sensor_list)
 
-            sensor.ttl_job = None
-            self.__reset_sensor(sensor)
+    def __emit_to_gateway(self, event, gateway, data):
+        '''emit data to members of a gateway room in each encoding in use'''
+
+        for encoding in self.gateway_rooms.get_encodings(gateway) or [JSON]:
+            self.sio.emit(event,
+                          encode(data, encoding),
+                          room=get_room(gateway, encoding),
+                          namespace=METRICS_NAMESPACE)
+
+    def __emit_event(self, diff, event_ids):
+        '''
+        store changes of sensors (merged from events event_ids) to history
+        and emit them to 'events' namespace
+        '''
+
+        start_t = perf_counter()
+        event_log_item = {
+            'time': time(),
+            'event_id': event_ids[0],
+            'seq': self.diff_buf.last_seq + 1,
+            'data': diff
+        }
+        if self.event_window.window:
+            event_log_item['event_ids'] = event_ids
+
+        # JSON of the whole event is always made, its size limits history
+        event_log_msg = json.dumps(event_log_item)
+        event_msgs = [(ALL_EVENTS_ROOM, event_log_msg)]
+        event_msgs.extend(
+            (get_room(ALL_EVENTS_ROOM, encoding), encode(event_log_item, encoding))
+            for encoding in self.subscriptions.get_encodings(ALL_EVENTS_ROOM)
+            if encoding != JSON)
+
+        # each distinct filter gets its own payload, serialized once per room
+        # and encoding of its subscribers
+        for room, event_filter in self.subscriptions.filters.items():
+            data = event_filter.apply(diff, self.node_id_index)
+            if data:
+                item = dict(event_log_item, data=data)
+                event_msgs.extend((get_room(room, encoding), encode(item, encoding))
+                                  for encoding in self.subscriptions.get_encodings(room))
+
+        # store log history
+        self.diff_buf.append(event_log_item, size=len(event_log_msg))
+        self.__observe('serialize', start_t)
+
+        start_t = perf_counter()
+        for room, event_msg in event_msgs:
+            self.sio.emit('event_response', event_msg, room=room, namespace=EVENTS_NAMESPACE)
+        self.__observe('emit', start_t)
+
+    def __emit_actuators(self, responses, event_ids):
+        '''
+        emit changed data for actuators to 'metrics' namespace,
+        responses are {event: {gateway: data}}
+        '''
+
+        del event_ids  # Ignored parameter
+        for event, gateways in responses.items():
+            for gateway, data in gateways.items():
+                logging.info('%s: %s', event, data)
+                self.__emit_to_gateway(event, gateway, {gateway: data})
 
     def finish_changes(self, diff, call_after_expire=False):
         '''
         schedule remaining TTLs
-        final emit of changes to SocketIO
+        final emit of changes to SocketIO (coalesced within emit windows)
           - changed data of sensors to 'events' namespace
           - changed data for actuators to 'metrics' namespace
         '''
@@ -429,9 +731,13 @@ class Sensors():
         else:
             raise TypeError("not a dict")
 
+        changed_sensors = []
+
+        start_t = perf_counter()
         for node_id in diff:
             for sensor_id, metrics in diff[node_id].items():
                 sensor = self.__get_sensor(node_id, sensor_id)
+                changed_sensors.append(sensor)
 
                 if isinstance(sensor.ttl, int) and isinstance(sensor.hit_timestamp,
                                                               float):
@@ -448,19 +754,13 @@ class Sensors():
                         ttl_end_job = True
 
                     if ttl_add_job:
-                        ttl_time = datetime.fromtimestamp(
-                            sensor.hit_timestamp) + timedelta(seconds=sensor.ttl)
-
-                        sensor.ttl_job = self.scheduler.add_job(
-                            func=self.sensor_expire,
-                            trigger=DateTrigger(run_date=ttl_time),
-                            id=f'exp_{node_id}.{sensor_id}',
-                            args=[sensor, event_id.get()],
-                            replace_existing=True)
-                        diff[node_id][sensor_id]['exp_timestamp'] = datetime.timestamp(
-                            sensor.ttl_job.next_run_time)
+                        sensor.exp_timestamp = sensor.hit_timestamp + sensor.ttl
+                        self.expiry.add(sensor, sensor.exp_timestamp, event_id.get())
+                        sensor.notify_change('exp_timestamp')
+                        diff[node_id][sensor_id]['exp_timestamp'] = sensor.exp_timestamp
 
                     if ttl_end_job:
+                        self.expiry.remove(sensor)
                         diff[node_id][sensor_id]['exp_timestamp'] = None
 
                 if metrics and sensor.mode == ACTUATOR:
@@ -477,35 +777,27 @@ class Sensors():
                         actuator_addr_values[sensor.gw][sensor.node_addr][
                             sensor.key] = sensor.value
 
-        logging.debug('changed metrics: %s', diff)
-
-        event_log_item = {'time': time(), 'event_id': event_id.get(), 'data': diff}
-        self.sio.emit('event_response',
-                      json.dumps(event_log_item),
-                      namespace=EVENTS_NAMESPACE)
+        self.__observe('ttl', start_t)
 
-        # store log history
-        self.diff_buf.append(event_log_item)
-        if len(self.diff_buf) > MAX_EVENTBUF_ITEMS:
-            del self.diff_buf[0]
-
-        if actuator_id_values:
-            for gateway, data in actuator_id_values.items():
-                logging.info('changed actuator ids: %s', data)
-                self.sio.emit('actuator_response',
-                              json.dumps({gateway: data}),
-                              room=gateway,
-                              namespace=METRICS_NAMESPACE)
-
-        if actuator_addr_values:
-            for gateway, data in actuator_addr_values.items():
-                logging.info('changed actuator addrs: %s', data)
-                self.sio.emit('actuator_addr_response',
-                              json.dumps({gateway: data}),
-                              room=gateway,
-                              namespace=METRICS_NAMESPACE)
+        logging.debug('changed metrics: %s', diff)
 
+        if self.state_store is not None:
+            start_t = perf_counter()
+            self.state_store.append(self.get_state(changed_sensors))
+            self.__observe('state_log', start_t)
+
+        eid = event_id.get()
+        self.event_window.add(diff, eid)
+        if actuator_id_values or actuator_addr_values:
+            self.actuator_window.add(
+                {
+                    'actuator_response': actuator_id_values,
+                    'actuator_addr_response': actuator_addr_values
+                }, eid)
+
+        start_t = perf_counter()
         diff2 = self.__get_changed_nodes_dict()
+        self.__observe('diff', start_t)
         if diff2:
             logging.debug("schedule expires: %s", diff2)
 
@@ -531,53 +823,164 @@ class Sensors():
                     logging.warning("sensor %s:%s not found", node_addr, key)
         return ret
 
-    def set_node_values(self, node_id, sensor_values_dict, increment=False):
-        changed = 0
+    def __add_template_sensors(self, node_id, template_id, sensor_ids):
+        '''set up given sensors of a node from a template'''
+
+        self.template_nodes[node_id] = template_id
+        node = self.node_id_index.setdefault(node_id, {})
+        new_sensors = []
+        for sx_id in sensor_ids:
+            sensor = self.node_template_index[template_id][sx_id].clone(node_id)
+            node[sx_id] = sensor
+            self.sensor_specs[(node_id, sx_id)] = ('template', template_id) + \
+                self.template_specs[(template_id, sx_id)]
+            self.addr_index.setdefault((sensor.node_addr, sensor.key), sensor)
+            self.journal.track(sensor, node_id, sx_id)
+            self.depgraph.add(node_id, sx_id, sensor.eval_require)
+            # eval code is already parsed with the template
+            sensor.evaluator = self.evaluator
+            new_sensors.append(sensor)
+        self.sensor_index.extend(new_sensors)
+        self.__add_cron_jobs(new_sensors)
+
+    def __setup_node_from_template(self, node_id, sensor_id):
+        '''create new node if there is a template'''
+
+        if (node_id not in self.node_id_index) and (sensor_id
+                                                    in self.sensor_template_index):
+            logging.debug("setup new node %s from template.", node_id)
+            t = self.sensor_template_index[sensor_id]
+            self.__add_template_sensors(node_id, t, list(self.node_template_index[t]))
+
+    def __set_sensor_value(self, node_id, sensor_id, value, increment=False):
+        '''
+        set value of a sensor and evaluate its own eval code
+        return the sensor if changed, otherwise None
+        '''
 
-        for sensor_id in sensor_values_dict:
+        self.__setup_node_from_template(node_id, sensor_id)
 
-            # create new node if there is a template
-            if (node_id not in self.node_id_index) and (sensor_id
-                                                        in self.sensor_template_index):
-                logging.debug("setup new node %s from template.", node_id)
-                self.node_id_index[node_id] = {}
-                t = self.sensor_template_index[sensor_id]
-                for sx_id, sx in self.node_template_index[t].items():
-                    sensor = sx.clone(node_id)
-                    self.node_id_index[node_id][sx_id] = sensor
-                    self.sensor_index.append(sensor)
-                    self.__add_cron_jobs(sensor)
-
-            sensor = self.__get_sensor(node_id, sensor_id)
-            if sensor.set(sensor_values_dict[sensor_id], increment=increment):
-                changed = 1
+        sensor = self.__get_sensor(node_id, sensor_id)
+        start_t = perf_counter()
+        changed = sensor.set(value, increment=increment)
+        self.__observe('set', start_t)
+        if not changed:
+            return None
 
-                if sensor.eval_code is not None:
-                    vars_dict = self.__get_sensor_required_vars(sensor)
-                    sensor.do_eval(vars_dict=vars_dict, update=False)
+        if sensor.eval_code is not None:
+            start_t = perf_counter()
+            vars_dict = self.__get_sensor_required_vars(sensor)
+            self.__eval_sensor(sensor, vars_dict, update=False)
+            self.__observe('eval', start_t)
+
+        return sensor
+
+    def set_node_values(self, node_id, sensor_values_dict, increment=False, batch=False):
+        '''
+        set sensors of a node given as {sensor_id:value} dict
+        with batch, sensors requiring the changed ones are evaluated once for all
+        values, otherwise after each value
+        raise KeyError if a node or a sensor is not found
+        '''
+
+        if batch:
+            changed_sensors = []
+            changes = {}
+            try:
+                for sensor_id, value in sensor_values_dict.items():
+                    sensor = self.__set_sensor_value(node_id,
+                                                     sensor_id,
+                                                     value,
+                                                     increment=increment)
+                    if sensor is not None:
+                        changed_sensors.append(sensor)
+            finally:
+                # values set before a KeyError are evaluated and emitted too
+                if changed_sensors:
+                    changes = self.__process_changes(changed_sensors)
+            return changes
+
+        changed = 0
 
-                self.__do_requiring_eval(sensor)
+        for sensor_id in sensor_values_dict:
+            sensor = self.__set_sensor_value(node_id,
+                                             sensor_id,
+                                             sensor_values_dict[sensor_id],
+                                             increment=increment)
+            if sensor is not None:
+                changed = 1
+                start_t = perf_counter()
+                self.__do_requiring_eval([sensor])
                 self.__used_dataset_reset()
+                self.__observe('requiring_eval', start_t)
 
         changes = {}
         if changed:
+            start_t = perf_counter()
             changes = self.__get_changed_nodes_dict()
+            self.__observe('diff', start_t)
             self.finish_changes(changes)
 
         return changes
 
-    def __reset_sensor(self, sensor, skip_eval=False):
-        sensor.reset()
+    def set_nodes_values(self, nodes_dict, increment=False):
+        '''
+        set sensors of many nodes given as {node_id:{sensor_id:value}} dict
+        eval propagation, diff and emit of changes run once for the whole batch,
+        sensors not found are skipped
+        '''
+
+        changed_sensors = []
+
+        for node_id, sensor_values_dict in nodes_dict.items():
+            for sensor_id, value in sensor_values_dict.items():
+                try:
+                    sensor = self.__set_sensor_value(node_id,
+                                                     sensor_id,
+                                                     value,
+                                                     increment=increment)
+                except KeyError:
+                    logging.warning("sensor %s.%s not found", node_id, sensor_id)
+                    continue
 
-        if not sensor.eval_skip_expired and not skip_eval and sensor.value is not None:
-            if sensor.eval_code is not None:
-                vars_dict = self.__get_sensor_required_vars(sensor)
-                sensor.do_eval(vars_dict=vars_dict, update=False)
+                if sensor is not None:
+                    changed_sensors.append(sensor)
+
+        changes = {}
+        if changed_sensors:
+            changes = self.__process_changes(changed_sensors)
+
+        return changes
 
-        self.__do_requiring_eval(sensor)
+    def __process_changes(self, changed_sensors, call_after_expire=False):
+        '''evaluate sensors requiring the changed ones, get and emit the changes'''
+
+        start_t = perf_counter()
+        self.__do_requiring_eval(changed_sensors)
         self.__used_dataset_reset()
+        self.__observe('requiring_eval', start_t)
+
+        start_t = perf_counter()
         changes = self.__get_changed_nodes_dict()
-        self.finish_changes(changes, call_after_expire=True)
+        self.__observe('diff', start_t)
+
+        self.finish_changes(changes, call_after_expire=call_after_expire)
+        return changes
+
+    def __reset_sensors(self, sensor_list, skip_eval=False):
+        '''reset given sensors, evaluate them and emit changes at once'''
+
+        for sensor in sensor_list:
+            sensor.reset()
+
+            if not sensor.eval_skip_expired and not skip_eval and sensor.value is not None:
+                if sensor.eval_code is not None:
+                    start_t = perf_counter()
+                    vars_dict = self.__get_sensor_required_vars(sensor)
+                    self.__eval_sensor(sensor, vars_dict, update=False)
+                    self.__observe('eval', start_t)
+
+        self.__process_changes(sensor_list, call_after_expire=True)
 
     def get_parser_arguments(self):
 
@@ -607,6 +1010,7 @@ class Sensors():
     def reset_values(self):
         for sensor in self.sensor_index:
             sensor.__init__()
+            sensor.notify_change()
 
         changes = self.__get_changed_nodes_dict()
         self.finish_changes(changes)
@@ -617,7 +1021,7 @@ class Sensors():
         def __init__(self, message):
             Exception.__init__(self, f"Config file: {message}")
 
-    def load_config(self, pars):
+    def __read_config(self, pars):
         try:
             with open(pars.config_file, 'r', encoding='utf-8') as stream:
                 if pars.config_jinja:
@@ -626,22 +1030,204 @@ class Sensors():
                         loader=FileSystemLoader(pars.config_dir)).from_string(
                             stream.read())
                     # load yaml
-                    config_dict = safe_load(t.render())
+                    config_dict = load(t.render(), Loader=SafeLoader)
                 else:
                     # load yaml
-                    config_dict = safe_load(stream)
+                    config_dict = load(stream, Loader=SafeLoader)
         except (YAMLError, TemplateSyntaxError, TemplateNotFound,
                 FileNotFoundError) as exc:
             raise self.ConfigException(exc) from exc
 
+        return config_dict
+
+    def load_config(self, pars, state=None):
+        config_dict = self.__read_config(pars)
         self.add_sensors(config_dict)
+        if state:
+            self.__restore_state(state)
         changes = self.__get_changed_nodes_dict()
         return changes
 
+    def __remove_sensors(self, sensor_list, keep_prev_data=()):
+        '''
+        remove given sensors with their cron jobs, TTL deadlines and dependencies,
+        previous data of sensors in keep_prev_data {(node_id, sensor_id)} are kept
+        for the diff with the same sensors added again
+        '''
+
+        removed = set(sensor_list)
+
+        for sensor in sensor_list:
+            (node_id, sensor_id) = (sensor.node_id, sensor.sensor_id)
+            node = self.node_id_index[node_id]
+            del node[sensor_id]
+            if not node:
+                del self.node_id_index[node_id]
+                self.template_nodes.pop(node_id, None)
+            del self.sensor_specs[(node_id, sensor_id)]
+            if (node_id, sensor_id) not in keep_prev_data:
+                self.prev_data.get(node_id, {}).pop(sensor_id, None)
+            self.journal.untrack(sensor)
+            # edges from requiring sensors are kept, they belong to their config
+            self.depgraph.remove(node_id, sensor_id)
+            self.expiry.remove(sensor)
+            self.eval_costs.pop(sensor, None)
+
+        for cron_str, (job, members) in list(self.cron_groups.items()):
+            members[:] = [member for member in members if member[0] not in removed]
+            if not members:
+                try:
+                    job.remove()
+                except JobLookupError:
+                    pass
+                del self.cron_groups[cron_str]
+
+        self.used_dataset_sensors -= removed
+        self.sensor_index = [sensor for sensor in self.sensor_index if sensor not in removed]
+
+        # the first sensor with given addr/key is found
+        self.addr_index = {}
+        for sensor in self.sensor_index:
+            self.addr_index.setdefault((sensor.node_addr, sensor.key), sensor)
+
+    def update_sensors(self, config_dict):
+        '''
+        apply a changed config: only added, removed and modified sensors are set up
+        (modified ones keep their state if the type is the same), templates are set
+        up again and nodes created from them follow their changes
+        return changed metrics
+        '''
+
+        # templates have no state
+        self.node_template_index = {}
+        self.sensor_template_index = {}
+        self.template_specs = {}
+
+        # (node_id, sensor_id): (spec, sensor config to be added or None if template)
+        new_specs = {}
+        for sensor_config in self.__iter_sensor_configs(config_dict):
+            (gw, node_id, node_addr, sensor_id, sensor_config_dict,
+             sensor_parent_config_dict, template, mode) = sensor_config
+            if template:
+                self.__add_sensor(*sensor_config)
+            else:
+                new_specs[(node_id, sensor_id)] = (('config', gw, node_addr, mode,
+                                                    sensor_config_dict,
+                                                    sensor_parent_config_dict),
+                                                   sensor_config)
+
+        config_nodes = {node_id for (node_id, _) in new_specs}
+        for node_id, template_id in list(self.template_nodes.items()):
+            if node_id in config_nodes:
+                # the node is not created from a template any more
+                del self.template_nodes[node_id]
+                continue
+            for sensor_id in self.node_template_index.get(template_id, {}):
+                new_specs[(node_id, sensor_id)] = (
+                    ('template', template_id) + self.template_specs[(template_id, sensor_id)],
+                    None)
+
+        removed = []
+        kept_state = {}
+        for key, spec in self.sensor_specs.items():
+            if key in new_specs and new_specs[key][0] == spec:
+                continue
+            sensor = self.__get_sensor(*key)
+            removed.append(sensor)
+            if key in new_specs:
+                kept_state[key] = (sensor.get_type(), self.get_state([sensor])[key])
+
+        added = [key for key, (spec, _) in new_specs.items()
+                 if self.sensor_specs.get(key) != spec]
+
+        self.__remove_sensors(removed, keep_prev_data=kept_state)
+
+        template_sensors = {}
+        for key in added:
+            (spec, sensor_config) = new_specs[key]
+            if sensor_config is not None:
+                self.__add_sensor(*sensor_config)
+            else:
+                template_sensors.setdefault((key[0], spec[1]), []).append(key[1])
+        for (node_id, template_id), sensor_ids in template_sensors.items():
+            self.__add_template_sensors(node_id, template_id, sensor_ids)
+
+        # drop parsed code of removed and edited sensors
+        self.evaluator.prune({sensor.eval_code for sensor in self.sensor_index} | {
+            sensor.eval_code
+            for node in self.node_template_index.values() for sensor in node.values()
+        })
+
+        restored_state = {
+            key: values
+            for key, (t, values) in kept_state.items()
+            if self.__get_sensor(*key).get_type() == t
+        }
+        # sensors with a changed type start again, their data are emitted whole
+        for (node_id, sensor_id) in kept_state.keys() - restored_state.keys():
+            self.prev_data.get(node_id, {}).pop(sensor_id, None)
+        self.__restore_state(restored_state)
+
+        logging.info("config updated: %d sensors added, %d removed (%d modified)",
+                     len(added), len(removed), len(kept_state))
+
+        return self.__get_changed_nodes_dict()
+
+    def get_state(self, sensor_list=None):
+        '''get persisted state of sensors as {(node_id, sensor_id): (STATE_ATTRS)}'''
+
+        if sensor_list is None:
+            sensor_list = self.sensor_index
+
+        get_values = attrgetter(*STATE_ATTRS)
+        return {(sensor.node_id, sensor.sensor_id): get_values(sensor)
+                for sensor in sensor_list}
+
+    def __restore_state(self, state):
+        '''
+        set state of sensors (nodes of templates are created),
+        unknown sensors are skipped, TTL deadlines are armed again
+        '''
+
+        restored = 0
+        for (node_id, sensor_id), values in state.items():
+            self.__setup_node_from_template(node_id, sensor_id)
+            sensor = self.node_id_index.get(node_id, {}).get(sensor_id)
+            if sensor is None:
+                continue
+
+            for attr, value in zip(STATE_ATTRS, values):
+                # an unset attribute reads as None, it is kept out of sensor data
+                if value is None and getattr(sensor, attr) is None:
+                    continue
+                setattr(sensor, attr, value)
+
+            if not isinstance(sensor.ttl, int):
+                sensor.exp_timestamp = None
+            if sensor.exp_timestamp is not None:
+                # an elapsed deadline expires right away
+                self.expiry.add(sensor, sensor.exp_timestamp)
+
+            sensor.notify_change()
+            restored += 1
+
+        logging.info("state of %d sensors restored", restored)
+
+    def load_state(self):
+        '''get saved state of sensors (None if state is not persisted)'''
+
+        if self.state_store is None:
+            return None
+        return self.state_store.load()
+
+    def save_state(self):
+        '''save a snapshot of state of all sensors (if state is persisted)'''
+
+        if self.state_store is not None:
+            self.state_store.save(self.get_state())
+
     def reload_config(self, pars):
-        self.default_values()
-        self.reset()
-        changes = self.load_config(pars)
+        changes = self.update_sensors(self.__read_config(pars))
         self.finish_changes(changes)
         self.sio.emit('reload_response')
         return changes
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+'''
+Persistent snapshots of sensor state with an append-only change log
+'''
+
+import logging
+import os
+import pickle
+
+# create logger
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+# persisted state attributes of a sensor
+STATE_ATTRS = ('value', 'prev_value', 'hits_total', 'hit_timestamp', 'duration_seconds',
+               'exp_timestamp')
+
+SNAPSHOT_MAGIC = b'LAPORTE-STATE-1\n'
+LOG_SUFFIX = '.log'
+
+
+class StateStore():
+    '''
+    Store state of sensors as {(node_id, sensor_id): (values of STATE_ATTRS)}.
+    A snapshot keeps the full state, changes made after the snapshot are
+    appended to a log. Both start with a generation number, so a log written
+    before the last snapshot is never replayed over it.
+    A snapshot should be saved after load, as a new log replaces the loaded one.
+    The files are pickled, they have to be as trusted as the config file.
+    '''
+    def __init__(self, path):
+        self.path = path
+        self.log_path = path + LOG_SUFFIX
+        self.generation = 0
+        self.log = None
+
+    @staticmethod
+    def __read_header(stream):
+        if stream.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+            raise ValueError("not a state file")
+        return pickle.load(stream)
+
+    def __open_log(self):
+        '''start a new change log of the current generation'''
+
+        if self.log is not None:
+            self.log.close()
+        self.log = open(self.log_path, 'wb')
+        self.log.write(SNAPSHOT_MAGIC)
+        pickle.dump(self.generation, self.log, protocol=pickle.HIGHEST_PROTOCOL)
+        self.log.flush()
+
+    def load(self):
+        '''
+        get state from the snapshot updated by the change log,
+        a truncated or damaged tail of the log is ignored
+        '''
+
+        state = {}
+
+        try:
+            with open(self.path, 'rb') as stream:
+                self.generation = self.__read_header(stream)
+                state = pickle.load(stream)
+        except FileNotFoundError:
+            pass
+        except (ValueError, EOFError, pickle.UnpicklingError) as exc:
+            logging.error("state snapshot %s not loaded: %s", self.path, exc)
+
+        items = 0
+        try:
+            with open(self.log_path, 'rb') as stream:
+                if self.__read_header(stream) == self.generation:
+                    while True:
+                        try:
+                            state.update(pickle.load(stream))
+                        except EOFError:
+                            break
+                        items += 1
+        except FileNotFoundError:
+            pass
+        except (ValueError, EOFError, pickle.UnpicklingError) as exc:
+            logging.error("state log %s not fully loaded: %s", self.log_path, exc)
+
+        logging.info("state of %d sensors loaded from %s (%d log items)", len(state),
+                     self.path, items)
+
+        return state
+
+    def save(self, state):
+        '''write a new snapshot (atomically) and start a new change log'''
+
+        self.generation += 1
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as stream:
+            stream.write(SNAPSHOT_MAGIC)
+            pickle.dump(self.generation, stream, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(state, stream, protocol=pickle.HIGHEST_PROTOCOL)
+            stream.flush()
+            os.fsync(stream.fileno())
+        os.replace(tmp_path, self.path)
+        self.__open_log()
+
+        logging.info("state of %d sensors saved to %s", len(state), self.path)
+
+    def append(self, state):
+        '''append changed state of some sensors to the change log'''
+
+        if self.log is None:
+            self.__open_log()
+        pickle.dump(state, self.log, protocol=pickle.HIGHEST_PROTOCOL)
+        self.log.flush()
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+            self.log = None
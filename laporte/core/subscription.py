@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+'''
+Filtered subscriptions of Socket.IO clients to sensor events
+'''
+
+import logging
+import json
+import hashlib
+from fnmatch import fnmatchcase
+from laporte.core.encoding import EncodedRooms
+
+# create logger
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+# room of clients subscribed to all events
+ALL_EVENTS_ROOM = 'all_events'
+
+FILTER_KEYS = ('gw', 'node_id', 'sensor_id', 'metrics')
+
+
+class EventFilter():
+    '''
+    Filter of sensor events given by a dict with optional keys
+      gw - gateway name(s)
+      node_id - glob pattern(s) of node_ids
+      sensor_id - sensor_id(s)
+      metrics - names of metrics
+    each key is a string or a list of strings, an event passes if all given keys match.
+    Equal filters map to the same Socket.IO room, so a filtered event is serialized
+    once per room regardless of number of subscribed clients.
+    '''
+    def __init__(self, spec):
+        if not isinstance(spec, dict):
+            raise ValueError("filter is not a dict")
+
+        unknown = set(spec) - set(FILTER_KEYS)
+        if unknown:
+            raise ValueError(f"unknown filter keys: {sorted(unknown)}")
+
+        norm = {}
+        for key, value in spec.items():
+            if isinstance(value, str):
+                value = [value]
+            if not isinstance(value, list) or not all(isinstance(x, str) for x in value):
+                raise ValueError(f"filter {key} is not a string or a list of strings")
+            norm[key] = sorted(set(value))
+
+        self.gws = set(norm['gw']) if 'gw' in norm else None
+        self.node_patterns = norm.get('node_id')
+        self.sensor_ids = set(norm['sensor_id']) if 'sensor_id' in norm else None
+        self.metrics = set(norm['metrics']) if 'metrics' in norm else None
+        self.node_matches = {}  # node_id: bool
+
+        digest = hashlib.sha1(json.dumps(norm, sort_keys=True).encode('utf-8'))
+        self.room = 'filter_' + digest.hexdigest()[0:16]
+
+    def match_node(self, node_id):
+        '''check node_id against glob patterns, the result is cached'''
+
+        if self.node_patterns is None:
+            return True
+
+        match = self.node_matches.get(node_id)
+        if match is None:
+            match = any(fnmatchcase(node_id, x) for x in self.node_patterns)
+            self.node_matches[node_id] = match
+        return match
+
+    def apply(self, data, node_id_index):
+        '''
+        get filtered {node_id: {sensor_id: {metric: value}}},
+        node_id_index is used to look up gateways of sensors
+        '''
+
+        ret = {}
+        for node_id, sensors in data.items():
+            if not self.match_node(node_id):
+                continue
+
+            for sensor_id, metrics in sensors.items():
+                if self.sensor_ids is not None and sensor_id not in self.sensor_ids:
+                    continue
+                if self.gws is not None:
+                    sensor = node_id_index.get(node_id, {}).get(sensor_id)
+                    if sensor is None or sensor.gw not in self.gws:
+                        continue
+                if self.metrics is not None:
+                    metrics = {k: v for k, v in metrics.items() if k in self.metrics}
+                    if not metrics:
+                        continue
+
+                if node_id not in ret:
+                    ret[node_id] = {}
+                ret[node_id][sensor_id] = metrics
+        return ret
+
+    def apply_events(self, events, node_id_index):
+        '''get filtered event items, events without any data left are omitted'''
+
+        ret = []
+        for event in events:
+            data = self.apply(event['data'], node_id_index)
+            if data:
+                ret.append(dict(event, data=data))
+        return ret
+
+
+class Subscriptions():
+    '''
+    Rooms of filtered subscriptions and their members (Socket.IO session ids),
+    rooms are split by encoding of members (see EncodedRooms)
+    '''
+    def __init__(self):
+        self.filters = {}  # room: EventFilter
+        self.rooms = EncodedRooms()
+        self.sid_rooms = {}  # sid: room
+
+    def add(self, sid, spec=None, encoding=None):
+        '''
+        subscribe a client to events passing the filter spec (all if None),
+        replaces its previous subscription, the encoding is kept if not given
+        return (room to join, EventFilter or None, previous room or None)
+        raise ValueError if spec is invalid
+        '''
+
+        event_filter = None if spec is None else EventFilter(spec)
+        prev_room = self.remove(sid)
+        if encoding is not None:
+            self.rooms.connect(sid, encoding)
+
+        if event_filter is None:
+            room = ALL_EVENTS_ROOM
+        else:
+            room = event_filter.room
+            event_filter = self.filters.setdefault(room, event_filter)
+
+        self.sid_rooms[sid] = room
+        return self.rooms.join(sid, room), event_filter, prev_room
+
+    def remove(self, sid):
+        '''unsubscribe a client, return its room'''
+
+        room = self.sid_rooms.pop(sid, None)
+        if room is None:
+            return None
+
+        encoded_room = self.rooms.leave(sid, room)
+        if room in self.filters and room not in self.rooms.members:
+            del self.filters[room]
+        return encoded_room
+
+    def disconnect(self, sid):
+        '''drop subscription and encoding of a disconnected client'''
+
+        self.remove(sid)
+        self.rooms.disconnect(sid)
+
+    def get_filter(self, sid):
+        '''get EventFilter of a client, None if it is subscribed to all events'''
+
+        return self.filters.get(self.sid_rooms.get(sid))
+
+    def get_encoding(self, sid):
+        '''get encoding of a client'''
+
+        return self.rooms.get_encoding(sid)
+
+    def get_encodings(self, room):
+        '''get encodings used by subscribers of a room'''
+
+        return self.rooms.get_encodings(room)
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+'''
+Coalescing window of emitted changes
+'''
+
+import logging
+from laporte.core.encoding import JSON, MSGPACK, encode, decode
+
+# create logger
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+
+def merge(dst, src):
+    '''merge nested dicts src into dst, values of the same path are replaced'''
+
+    for key, value in src.items():
+        if isinstance(value, dict):
+            merge(dst.setdefault(key, {}), value)
+        else:
+            dst[key] = value
+
+
+def merge_events(payloads):
+    '''
+    merge encoded events into one with the latest values and all event IDs,
+    it is encoded as the last one
+    '''
+
+    items = [decode(payload) for payload in payloads]
+    data = {}
+    event_ids = []
+    for item in items:
+        merge(data, item['data'])
+        for eid in item.get('event_ids', [item.get('event_id')]):
+            if eid not in event_ids:
+                event_ids.append(eid)
+
+    merged = dict(items[-1], data=data, event_id=event_ids[0], event_ids=event_ids)
+    return encode(merged, MSGPACK if isinstance(payloads[-1], bytes) else JSON)
+
+
+class EventsCoalescer():
+    '''
+    Merge runs of event_response messages [(event, [payload])] into one event,
+    the latest state of each sensor is kept, other messages are kept as they are.
+    Slow clients usually queue the same messages, so the last merges are
+    remembered and the merged payload is shared.
+    '''
+    def __init__(self, memo_size=16):
+        self.memo_size = memo_size
+        self.memo = {}  # ids of payloads: (payloads, merged payload)
+
+    def merge(self, payloads):
+        key = tuple(id(payload) for payload in payloads)
+        cached = self.memo.get(key)
+        if cached is None:
+            if len(self.memo) >= self.memo_size:
+                del self.memo[next(iter(self.memo))]
+            # payloads are kept referenced, so their ids are not reused
+            cached = self.memo[key] = (payloads, merge_events(payloads))
+        return cached[1]
+
+    def __call__(self, messages):
+        ret = []
+        run = []
+        for message in messages + [(None, None)]:
+            if message[0] == 'event_response':
+                run.append(message)
+                continue
+
+            if len(run) > 1:
+                ret.append(('event_response', [self.merge([data[0] for _, data in run])]))
+            else:
+                ret.extend(run)
+            run = []
+            ret.append(message)
+
+        return ret[:-1]
+
+
+class EmitWindow():
+    '''
+    Nested dicts of changes added within a time window are merged
+    (the last value wins) and passed to the flush callback at once
+    with a list of event IDs of all merged changes.
+    The window opens with the first change, with no window (0) changes are
+    passed to the callback immediately.
+    '''
+    def __init__(self, sio, callback, window=0):
+        self.sio = sio
+        self.callback = callback
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        self.pending = {}
+        self.event_ids = []
+        self.scheduled = False
+
+    def add(self, data, eid=None):
+        '''add changes caused by an event eid'''
+
+        if not self.window:
+            self.callback(data, [eid])
+            return
+
+        merge(self.pending, data)
+        if eid not in self.event_ids:
+            self.event_ids.append(eid)
+
+        if not self.scheduled:
+            self.scheduled = True
+            self.sio.start_background_task(self.__flush_later)
+
+    def __flush_later(self):
+        self.sio.sleep(self.window)
+        self.flush()
+
+    def flush(self):
+        '''pass pending changes to the callback'''
+
+        self.scheduled = False
+        if not self.pending:
+            return
+
+        (data, event_ids) = (self.pending, self.event_ids)
+        self.pending = {}
+        self.event_ids = []
+        self.callback(data, event_ids)
@@ -7,18 +7,31 @@ import logging
 import hashlib
 import json
 from flask_socketio import Namespace, emit
-from laporte.argparser import pars
-from laporte.app import event_id, sio
+from laporte.argparser import pars, LOG_LEVEL_STRINGS
+from laporte.app import event_id, sio, send_queues
+from laporte.app.sendqueue import DROP_OLDEST
 from laporte.metrics import metrics
 from laporte.metrics.common import socketio_duration_metric
-from laporte.logger.handlers import PrometheusHandler, SioHandler, LOGS_NAMESPACE
+from laporte.logger.handlers import (BatchQueueHandler, ConsoleHandler,
+                                     ModuleLevelFilter, PrometheusHandler, SioHandler,
+                                     LOGS_NAMESPACE, MAX_LOGBUF_ITEMS)
+
+# a key of log levels setting the level of modules without their own level
+DEFAULT_LEVEL_KEY = 'default'
 
 
 class ConfLogger():
     '''
-    set a logger with configured handlers and filters
+    set a logger with configured handlers and filters,
+    records are only enqueued in the logging call, handlers get them in batches
+    from a background task, log levels of modules can be changed at runtime
     '''
-    def __init__(self, name, log_level=logging.DEBUG, log_verbose=False):
+    def __init__(self,
+                 name,
+                 log_level=logging.DEBUG,
+                 log_verbose=False,
+                 history_items=MAX_LOGBUF_ITEMS,
+                 history_bytes=None):
         '''
         set logger
         '''
@@ -27,21 +40,29 @@ class ConfLogger():
         if log_verbose:
             log_level = logging.DEBUG
 
+        console_handler = ConsoleHandler()
+        console_handler.setFormatter(
+            logging.Formatter('%(levelname)s %(event_id)s %(module)s %(funcName)s:'
+                              ' %(message)s'))
+
         handlers = [
-            logging.StreamHandler(),
+            console_handler,
             self.prometheus_handler,
         ]
 
         # when verbose debug level (-v parameter) is set
         # do not log to Socket.IO (recursion loops due log itself)
         if not log_verbose:
-            self.sio_handler = SioHandler(sio)
+            self.sio_handler = SioHandler(sio,
+                                          max_items=history_items,
+                                          max_bytes=history_bytes)
             handlers.append(self.sio_handler)
 
-        logging.basicConfig(format='%(levelname)s %(event_id)s %(module)s %(funcName)s:'
-                            ' %(message)s',
-                            level=log_level,
-                            handlers=handlers)
+        self.level_filter = ModuleLevelFilter(log_level)
+        self.queue_handler = BatchQueueHandler(sio, handlers)
+        self.queue_handler.addFilter(self.level_filter)
+
+        logging.basicConfig(level=log_level, handlers=[self.queue_handler])
 
         old_factory = logging.getLogRecordFactory()
 
@@ -59,13 +80,63 @@ class ConfLogger():
         self.logger = logging.getLogger(name)
 
         if not log_verbose:
-            logging.getLogger('apscheduler').setLevel(logging.WARNING)
+            self.set_levels({'apscheduler': 'WARNING'})
 
     def get_logger(self):
         return self.logger
 
+    def get_levels(self):
+        '''get {DEFAULT_LEVEL_KEY: level, module: level} with level names'''
+
+        ret = {DEFAULT_LEVEL_KEY: logging.getLevelName(self.level_filter.level)}
+        ret.update({
+            name: logging.getLevelName(level)
+            for name, level in self.level_filter.levels.items()
+        })
+        return ret
+
+    def set_levels(self, levels):
+        '''
+        set log levels given as {module: level name} at runtime,
+        DEFAULT_LEVEL_KEY sets the default level, None level removes level of a module,
+        raise ValueError when a level is invalid
+        '''
 
-cl = ConfLogger(__name__, log_level=pars.log_level, log_verbose=pars.log_verbose)
+        for name, level_name in levels.items():
+            valid = (isinstance(level_name, str)
+                     and level_name.upper() in LOG_LEVEL_STRINGS) or (
+                         level_name is None and name != DEFAULT_LEVEL_KEY)
+            if not (isinstance(name, str) and valid):
+                raise ValueError(f"invalid log level {level_name} of {name} "
+                                 f"(choose from {LOG_LEVEL_STRINGS})")
+
+        level = self.level_filter.level
+        module_levels = dict(self.level_filter.levels)
+        for name, level_name in levels.items():
+            if name == DEFAULT_LEVEL_KEY:
+                level = getattr(logging, level_name.upper())
+                continue
+
+            if level_name is None:
+                module_levels.pop(name, None)
+            else:
+                module_levels[name] = getattr(logging, level_name.upper())
+
+            # a logger of the module (e.g. a library one) gets the same level
+            logging.getLogger(name).setLevel(module_levels.get(name, logging.NOTSET))
+
+        self.level_filter.set_levels(level, module_levels)
+        # the root logger lets through records of the most verbose module
+        logging.getLogger().setLevel(min([level] + list(module_levels.values())))
+
+        return self.get_levels()
+
+
+cl = ConfLogger(__name__,
+                log_level=pars.log_level,
+                log_verbose=pars.log_verbose,
+                history_items=pars.log_history_items,
+                history_bytes=pars.log_history_bytes)
 logger = cl.get_logger()
 
 
@@ -82,8 +153,10 @@ class LogsNamespace(Namespace):
 
         # at first emit the whole log history
         emit('hist_response',
-             json.dumps(cl.sio_handler.log_buf),
+             json.dumps(cl.sio_handler.log_buf.since()),
              namespace=LOGS_NAMESPACE)
 
 
 sio.on_namespace(LogsNamespace(LOGS_NAMESPACE))
+# a slow client of logs misses the oldest messages
+send_queues.set_policy(LOGS_NAMESPACE, DROP_OLDEST)
@@ -2,14 +2,147 @@
 Custom handlers for python logger
 '''
 
+import sys
 import logging
+import logging.handlers
 import json
+from collections import deque, Counter
+from laporte.app.ringbuf import RingBuffer
 from laporte.metrics import metrics
 from laporte.metrics.common import log_message_metric
 
 LOGS_NAMESPACE = '/logs'
 MAX_LOGBUF_ITEMS = 2048
 
+# enqueued records are passed to handlers in batches after this time
+LOG_FLUSH_INTERVAL = 0.05
+# max enqueued records, the oldest ones are dropped above it
+LOG_QUEUE_ITEMS = 65536
+
+
+def get_module_name(pathname):
+    '''get dotted name of an imported module from its file path'''
+
+    for name, module in list(sys.modules.items()):
+        if getattr(module, '__file__', None) == pathname:
+            return name
+    return None
+
+
+class ModuleLevelFilter(logging.Filter):
+    '''
+    a logging.Filter with log levels of modules, a level of a module applies to
+    its submodules too (e.g. laporte.core), other records pass by the default level
+    '''
+    def __init__(self, level=logging.NOTSET):
+        logging.Filter.__init__(self)
+        self.level = level
+        self.levels = {}  # module name: level
+        self.cache = {}  # pathname: level
+
+    def set_levels(self, level, levels):
+        self.level = level
+        self.levels = levels
+        self.cache = {}
+
+    def get_level(self, record):
+        '''get level of the module of a record'''
+
+        name = get_module_name(record.pathname) or record.name
+        while name:
+            if name in self.levels:
+                return self.levels[name]
+            name = name.rpartition('.')[0]
+        return self.level
+
+    def filter(self, record):
+        level = self.cache.get(record.pathname)
+        if level is None:
+            level = self.cache[record.pathname] = self.get_level(record)
+        return record.levelno >= level
+
+
+class BatchQueueHandler(logging.handlers.QueueHandler):
+    '''
+    a logging.handlers.QueueHandler that only formats the message of a record
+    and enqueues it, a background task passes enqueued records to the handlers
+    in batches (handlers with handle_batch method get the whole batch at once).
+    The message is formatted eagerly in the logging call, arguments are often
+    mutable objects (e.g. dicts of changes) which can change before a flush.
+    '''
+    def __init__(self,
+                 sio,
+                 handlers,
+                 interval=LOG_FLUSH_INTERVAL,
+                 max_items=LOG_QUEUE_ITEMS):
+        logging.handlers.QueueHandler.__init__(self, deque(maxlen=max_items))
+        formatter = logging.Formatter('%(message)s')
+        self.setFormatter(formatter)
+        self.sio = sio
+        self.handlers = handlers
+        self.interval = interval
+        self.scheduled = False
+
+    def prepare(self, record):
+        # the handler is the only one of the root logger,
+        # so the record is not copied (unlike QueueHandler.prepare)
+        record.msg = self.format(record)
+        record.args = None
+        record.exc_info = None
+        record.exc_text = None
+        return record
+
+    def enqueue(self, record):
+        self.queue.append(record)
+        if not self.scheduled:
+            self.scheduled = True
+            self.sio.start_background_task(self.__flush_later)
+
+    def __flush_later(self):
+        self.sio.sleep(self.interval)
+        self.flush()
+
+    def flush(self):
+        '''pass enqueued records to the handlers'''
+
+        self.scheduled = False
+        records = [self.queue.popleft() for _ in range(len(self.queue))]
+        if not records:
+            return
+
+        for handler in self.handlers:
+            batch = [
+                record for record in records
+                if record.levelno >= handler.level and handler.filter(record)
+            ]
+            if not batch:
+                continue
+
+            handle_batch = getattr(handler, 'handle_batch', None)
+            if handle_batch is None:
+                for record in batch:
+                    handler.handle(record)
+                continue
+
+            try:
+                handle_batch(batch)
+            except Exception:  # pylint: disable=broad-except
+                handler.handleError(batch[-1])
+
+
+class ConsoleHandler(logging.StreamHandler):
+    '''
+    a logging.StreamHandler that writes a batch of records at once
+    '''
+    def handle_batch(self, records):
+        text = ''.join(self.format(record) + self.terminator for record in records)
+        self.acquire()
+        try:
+            self.stream.write(text)
+            self.flush()
+        finally:
+            self.release()
+
 
 class PrometheusHandler(logging.StreamHandler):
     '''
@@ -17,47 +150,72 @@ class PrometheusHandler(logging.StreamHandler):
     '''
     def __init__(self):
         logging.StreamHandler.__init__(self)
+        self.counters = {}  # levelname: counter slot
+
+    def get_counter(self, levelname):
+        counter = self.counters.get(levelname)
+        if counter is None:
+            counter = metrics.get_counter(**log_message_metric,
+                                          labels={'loglevel': levelname})
+            self.counters[levelname] = counter
+        return counter
 
     def emit(self, record):
-        # don't count sio log emits
-        if 'log_response' in record.args:
-            return
+        self.get_counter(record.levelname)['total'] += 1
 
-        metrics.counter_inc(**log_message_metric, labels={'loglevel': record.levelname})
+    def handle_batch(self, records):
+        for levelname, count in Counter(record.levelname for record in records).items():
+            self.get_counter(levelname)['total'] += count
 
 
 class SioHandler(logging.StreamHandler):
     '''
-    a logging.StreamHandler that emits logs to Socket.IO
+    a logging.StreamHandler that emits logs to Socket.IO,
+    a batch of records is emitted in one message as a list
     '''
-    def __init__(self, sio):
+    def __init__(self, sio, max_items=MAX_LOGBUF_ITEMS, max_bytes=None):
         logging.StreamHandler.__init__(self)
         formatter = logging.Formatter('%(message)s')
         self.setFormatter(formatter)
         self.sio = sio
-        self.log_buf = []
+        self.log_buf = RingBuffer(max_items, max_bytes)
+
+    def __append(self, record):
+        '''append a record to the history, return it serialized'''
 
-    def emit(self, record):
         msg = self.format(record)
 
+        try:
+            emit_msg = {
+                'time': record.created,
+                'event_id': record.event_id,
+                'levelname': record.levelname,
+                'module': record.module,
+                'filename': record.filename,
+                'fileno': record.lineno,
+                'funcname': record.funcName,
+                'msg': msg
+            }
+        except (NameError, AttributeError):
+            emit_msg = {}
+
+        json_msg = json.dumps(emit_msg)
+        self.log_buf.append(emit_msg, size=len(json_msg))
+        return json_msg
+
+    def emit(self, record):
         if not (record.event_id is None or self.sio is None):
-            try:
-                emit_msg = {
-                    'time': record.created,
-                    'event_id': record.event_id,
-                    'levelname': record.levelname,
-                    'module': record.module,
-                    'filename': record.filename,
-                    'fileno': record.lineno,
-                    'funcname': record.funcName,
-                    'msg': msg
-                }
-            except (NameError, AttributeError):
-                emit_msg = {}
-
-            self.log_buf.append(emit_msg)
-            if len(self.log_buf) > MAX_LOGBUF_ITEMS:
-                del self.log_buf[0]
-
-            # print("SIO LOG {}".format(emit_msg), flush=True)
-            self.sio.emit('log_response', json.dumps(emit_msg), namespace=LOGS_NAMESPACE)
+            json_msg = self.__append(record)
+            self.sio.emit('log_response', json_msg, namespace=LOGS_NAMESPACE)
+
+    def handle_batch(self, records):
+        if self.sio is None:
+            return
+
+        json_msgs = [
+            self.__append(record) for record in records if record.event_id is not None
+        ]
+        if json_msgs:
+            self.sio.emit('log_response',
+                          '[' + ','.join(json_msgs) + ']',
+                          namespace=LOGS_NAMESPACE)
@@ -4,8 +4,8 @@ Prometheus metrics containers and decorators
 '''
 
 import logging
-from operator import itemgetter
-from time import time
+from bisect import bisect_left
+from time import perf_counter
 from functools import wraps
 from laporte.version import app_name
 
@@ -20,6 +20,23 @@ class PrometheusMetrics:
     def __init__(self):
         self.counters = {}
         self.summaries = {}
+        self.histograms = {}
+        self.counter_slots = {}  # (prefix, name, suffix, label items): counter slot
+
+    @staticmethod
+    def __get_slot(container, metric_name, labels, init):
+        '''
+        get (create) a slot - dict with values of the metric with given labels,
+        label keys and values are converted to strings only once, here
+        '''
+
+        metric_id = metric_name + str(list(labels.keys()))
+        label_values = str(list(labels.values()))
+
+        slots = container.setdefault(metric_id, {})
+        if label_values not in slots:
+            slots[label_values] = dict(init, labels=labels)
+        return slots[label_values]
 
     def func_measure(self,
                      prefix=app_name,
@@ -27,7 +44,8 @@ class PrometheusMetrics:
                      suffix='seconds',
                      help_str='duration of the operation',
                      labels=None,
-                     log=False):
+                     log=False,
+                     buckets=None):
         '''
         Update duration (summary) of any function with this decorator is called.
 
@@ -38,39 +56,44 @@ class PrometheusMetrics:
             help_str (str): help_str string will aid users track back to what the metric was
             labels (dict): to differentiate the characteristics of the thing that is being measured
             log (bool): log measured value to python logger (loglevel INFO)
+            buckets (list): upper bounds of histogram buckets, a summary is kept if None
         Returns:
             Decorator.
         '''
         if labels is None:  # because {} is dangerous default value
             labels = {}
 
+        # the slot is resolved once, a call only updates it
+        metric_name = f'{prefix}_{name}_{suffix}'
+        if buckets is None:
+            bounds = None
+            slot = self.__get_slot(self.summaries, metric_name, labels, {
+                'count': 0,
+                'sum': 0.0,
+                'help_str': help_str
+            })
+        else:
+            slot = self.get_histogram(prefix=prefix,
+                                      name=name,
+                                      suffix=suffix,
+                                      help_str=help_str,
+                                      labels=labels,
+                                      buckets=buckets)
+            bounds = slot['bounds']
+
         def decorator(func):
             @wraps(func)
             def _time_it(*args, **kwargs):
-                start_t = time()
+                start_t = perf_counter()
 
                 try:
                     return func(*args, **kwargs)
                 finally:
-                    metric_name = f'{prefix}_{name}_{suffix}'
-                    label_keys = str(list(map(itemgetter(0), labels.items())))
-                    label_values = str(list(map(itemgetter(1), labels.items())))
-                    metric_id = metric_name + label_keys
-
-                    if metric_id not in self.summaries:
-                        self.summaries[metric_id] = {}
-
-                    if label_values not in self.summaries[metric_id]:
-                        self.summaries[metric_id][label_values] = {
-                            'count': 0,
-                            'sum': 0.0,
-                            'labels': labels,
-                            'help_str': help_str
-                        }
-
-                    duration = time() - start_t
-                    self.summaries[metric_id][label_values]['count'] += 1
-                    self.summaries[metric_id][label_values]['sum'] += duration
+                    duration = perf_counter() - start_t
+                    slot['count'] += 1
+                    slot['sum'] += duration
+                    if bounds is not None:
+                        slot['buckets'][bisect_left(bounds, duration)] += 1
                     if log:
                         logging.debug("duration %s %s: %0.4fs", metric_name, labels,
                                       duration)
@@ -79,6 +102,48 @@ class PrometheusMetrics:
 
         return decorator
 
+    def get_histogram(self,
+                      prefix=app_name,
+                      name='duration',
+                      suffix='seconds',
+                      help_str='duration of the operation',
+                      labels=None,
+                      buckets=()):
+        '''
+        Get the histogram slot, a dict updated by observe(slot, value).
+
+        Args:
+            prefix (str): single-word prefix relevant to the domain the metric belongs to
+            name (str): represent a measured metric
+            suffix (str): describing the unit, in plural form
+            help_str (str): help_str string will aid users track back to what the metric was
+            labels (dict): to differentiate the characteristics of the thing that is being measured
+            buckets (list): upper bounds of histogram buckets (+Inf is added)
+        Returns:
+            dict.
+        '''
+
+        if labels is None:  # because {} is dangerous default value
+            labels = {}
+
+        bounds = tuple(sorted(buckets))
+        return self.__get_slot(
+            self.histograms, f'{prefix}_{name}_{suffix}', labels, {
+                'count': 0,
+                'sum': 0.0,
+                'bounds': bounds,
+                'buckets': [0] * (len(bounds) + 1),  # the last one is +Inf
+                'help_str': help_str
+            })
+
+    @staticmethod
+    def observe(slot, value):
+        '''add a value to the histogram slot'''
+
+        slot['count'] += 1
+        slot['sum'] += value
+        slot['buckets'][bisect_left(slot['bounds'], value)] += 1
+
     def func_count(self,
                    step=1,
                    prefix=app_name,
@@ -104,24 +169,55 @@ class PrometheusMetrics:
         if labels is None:  # because {} is dangerous default value
             labels = {}
 
+        metric_name = f'{prefix}_{name}_{suffix}'
+        slot = self.get_counter(prefix=prefix,
+                                name=name,
+                                suffix=suffix,
+                                help_str=help_str,
+                                labels=labels)
+
         def decorator(func):
             @wraps(func)
             def _counter_inc(*args, **kwargs):
                 try:
                     return func(*args, **kwargs)
                 finally:
-                    self.counter_inc(step=step,
-                                     prefix=prefix,
-                                     name=name,
-                                     suffix=suffix,
-                                     labels=labels,
-                                     help_str=help_str,
-                                     log=log)
+                    slot['total'] += step
+                    if log:
+                        logging.debug("total count of %s %s: %f", metric_name, labels,
+                                      slot['total'])
 
             return _counter_inc
 
         return decorator
 
+    def get_counter(self,
+                    prefix=app_name,
+                    name='counter',
+                    suffix='total',
+                    help_str='number of operation calls',
+                    labels=None):
+        '''
+        Get the accumulating counter slot, a dict incremented as slot['total'] += step.
+
+        Args:
+            prefix (str): single-word prefix relevant to the domain the metric belongs to
+            name (str): represent a measured metric
+            suffix (str): counter has _total as a suffix in addition to the metric unit
+            help_str (str): help_str string will aid users track back to what the metric was
+            labels (dict): to differentiate the characteristics of the thing that is being measured
+        Returns:
+            dict.
+        '''
+
+        if labels is None:  # because {} is dangerous default value
+            labels = {}
+
+        return self.__get_slot(self.counters, f'{prefix}_{name}_{suffix}', labels, {
+            'total': 0,
+            'help_str': help_str
+        })
+
     def counter_inc(self,
                     step=1,
                     prefix=app_name,
@@ -147,25 +243,19 @@ class PrometheusMetrics:
         if labels is None:  # because {} is dangerous default value
             labels = {}
 
-        metric_name = f'{prefix}_{name}_{suffix}'
-        label_keys = str(list(map(itemgetter(0), labels.items())))
-        label_values = str(list(map(itemgetter(1), labels.items())))
-        metric_id = metric_name + label_keys
-
-        if metric_id not in self.counters:
-            self.counters[metric_id] = {}
-
-        if label_values not in self.counters[metric_id]:
-            self.counters[metric_id][label_values] = {
-                'total': 0,
-                'labels': labels,
-                'help_str': help_str
-            }
+        key = (prefix, name, suffix, tuple(labels.items()))
+        slot = self.counter_slots.get(key)
+        if slot is None:
+            slot = self.counter_slots[key] = self.get_counter(prefix=prefix,
+                                                              name=name,
+                                                              suffix=suffix,
+                                                              help_str=help_str,
+                                                              labels=labels)
 
-        self.counters[metric_id][label_values]['total'] += step
+        slot['total'] += step
         if log:
-            logging.debug("total count of %s %s: %f", metric_name, labels,
-                          self.counters[metric_id][label_values]['total'])
+            logging.debug("total count of %s_%s_%s %s: %f", prefix, name, suffix, labels,
+                          slot['total'])
 
 
 metrics = PrometheusMetrics()
@@ -3,15 +3,26 @@
 Metrics Blueprint with custom collector
 '''
 
+import gzip
 from operator import itemgetter
-from flask import Blueprint, Response
+from flask import Blueprint, Response, request
 from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
+from prometheus_client.openmetrics import exposition as openmetrics
 from prometheus_client.core import REGISTRY
 from prometheus_client.core import (InfoMetricFamily, GaugeMetricFamily,
-                                    CounterMetricFamily, SummaryMetricFamily)
+                                    CounterMetricFamily, SummaryMetricFamily,
+                                    HistogramMetricFamily)
+from prometheus_client.utils import floatToGoString
+from laporte.argparser import pars
 from laporte.core.sensor import COUNTER
 from laporte.version import app_name, __version__
 from laporte.metrics import metrics
+from laporte.metrics.common import (sensor_eval_seconds_metric, sensor_evals_metric,
+                                    sio_queue_messages_metric, sio_queue_bytes_metric,
+                                    sio_queue_clients_metric)
+from laporte.metrics.exposition import (ExpositionCache, TEXT, OPENMETRICS,
+                                        OPENMETRICS_EOF)
+from laporte.app import send_queues
 from laporte.core import sensors
 
 metrics_bp = Blueprint('metrics', __name__)
@@ -19,14 +30,52 @@ metrics_bp = Blueprint('metrics', __name__)
 
 @metrics_bp.route('/metrics')
 def export_metrics():
-    '''Export prometheus metrics'''
-    return Response(generate_latest(REGISTRY), mimetype=CONTENT_TYPE_LATEST)
+    '''
+    Export prometheus metrics
+    metrics of sensors are served from the exposition cache (if enabled),
+    OpenMetrics format and gzip encoding are used when accepted by a client
+    '''
+
+    accept = request.headers.get('Accept', '')
+    if 'application/openmetrics-text' in accept:
+        content_type = openmetrics.CONTENT_TYPE_LATEST
+        output = openmetrics.generate_latest(REGISTRY)
+        if exposition_cache is not None:
+            # sensor families have to precede the final EOF marker
+            output = (output[:-len(OPENMETRICS_EOF)] + exposition_cache.get(OPENMETRICS) +
+                      OPENMETRICS_EOF)
+    else:
+        content_type = CONTENT_TYPE_LATEST
+        output = generate_latest(REGISTRY)
+        if exposition_cache is not None:
+            output += exposition_cache.get(TEXT)
+
+    # the format and the encoding depend on these request headers (for caches)
+    headers = {'Vary': 'Accept, Accept-Encoding'}
+    if request.accept_encodings['gzip'] > 0:  # not refused by gzip;q=0
+        output = gzip.compress(output)
+        headers['Content-Encoding'] = 'gzip'
+
+    return Response(output, headers=headers, content_type=content_type)
 
 
 class CustomCollector():
-    def __init__(self, inner_metrics, inner_sensors):
+    def __init__(self,
+                 inner_metrics,
+                 inner_sensors,
+                 export_sensors=True,
+                 streaming=False,
+                 eval_cost_top=0,
+                 inner_send_queues=None):
         self.metrics = inner_metrics
         self.sensors = inner_sensors
+        self.send_queues = inner_send_queues
+        self.export_sensors = export_sensors
+        self.streaming = streaming
+        self.eval_cost_top = eval_cost_top
+        self.export_index = {}
+        self.export_index_len = 0
+        self.export_index_epoch = None
 
     def __get_label_keys(self, values_data: dict) -> list:
         '''
@@ -90,6 +139,28 @@ class CustomCollector():
 
                 met.add_metric(self.__get_label_values(values_data), count, summ)
 
+        # dump stored duration histograms
+        for metric_id, labels_data in self.metrics.histograms.items():
+            for _, values_data in labels_data.items():  # unused values_key
+                buckets = []
+                total = 0
+                for bound, count in zip(values_data['bounds'] + (float('inf'), ),
+                                        values_data['buckets']):
+                    total += count
+                    buckets.append((floatToGoString(bound), total))
+
+                if metric_id not in families:
+                    met = HistogramMetricFamily(
+                        metric_id.split('[')[0],
+                        self.__get_help_str(values_data),
+                        labels=self.__get_label_keys(values_data))
+                    families[metric_id] = met
+                else:
+                    met = families[metric_id]
+
+                met.add_metric(self.__get_label_values(values_data), buckets,
+                               values_data['sum'])
+
         # dump stored counters
         for metric_id, labels_data in self.metrics.counters.items():
             for _, values_data in labels_data.items():  # unused values_key
@@ -105,20 +176,92 @@ class CustomCollector():
 
                 met.add_metric(self.__get_label_values(values_data), total)
 
+        families.update(self.get_eval_cost_families())
+        families.update(self.get_send_queue_families())
+
+        if self.export_sensors and self.streaming:
+            for family in sorted(families, key=str.lower):
+                yield families[family]
+            yield from self.stream_sensor_families()
+            return
+
+        if self.export_sensors:
+            families.update(self.get_sensor_families(self.sensors.sensor_index))
+
         for family in sorted(families, key=str.lower):
             yield families[family]
 
-        # dump laporte sensors
-        for sensor in self.sensors.sensor_index:
+    def get_eval_cost_families(self):
+        '''get {metric_id: metric family} of eval costs of the most expensive sensors'''
+
+        costs = self.sensors.get_eval_costs(self.eval_cost_top)
+        if not costs:
+            return {}
+
+        labels = ['node_id', 'sensor_id']
+        families = {}
+        for metric in (sensor_evals_metric, sensor_eval_seconds_metric):
+            metric_name = f"{metric['prefix']}_{metric['name']}_{metric['suffix']}"
+            help_str = f"{metric['help_str']} (labels: {', '.join(labels)})"
+            families[metric_name + str(labels)] = CounterMetricFamily(metric_name,
+                                                                      help_str,
+                                                                      labels=labels)
+
+        (evals, seconds) = families.values()
+        for sensor, evals_total, seconds_total in costs:
+            evals.add_metric([sensor.node_id, sensor.sensor_id], evals_total)
+            seconds.add_metric([sensor.node_id, sensor.sensor_id], seconds_total)
+
+        return families
+
+    def get_send_queue_families(self):
+        '''get {metric_id: metric family} of depths of send queues of Socket.IO clients'''
+
+        if self.send_queues is None:
+            return {}
+
+        labels = ['namespace']
+        families = {}
+        for metric in (sio_queue_clients_metric, sio_queue_messages_metric,
+                       sio_queue_bytes_metric):
+            metric_name = f"{metric['prefix']}_{metric['name']}_{metric['suffix']}"
+            help_str = f"{metric['help_str']} (labels: {', '.join(labels)})"
+            families[metric_name + str(labels)] = GaugeMetricFamily(metric_name,
+                                                                    help_str,
+                                                                    labels=labels)
+
+        (clients, messages, size) = families.values()
+        for namespace, (clients_total, messages_total,
+                        size_total) in self.send_queues.get_depths().items():
+            clients.add_metric([namespace], clients_total)
+            messages.add_metric([namespace], messages_total)
+            size.add_metric([namespace], size_total)
+
+        return families
+
+    @staticmethod
+    def get_metric_name(name, prefix):
+        '''get name of exported metric with a prefix'''
+
+        if prefix is None:
+            return f'{app_name}_{name}'
+        return f'{prefix}_{name}' if prefix else name
+
+    @staticmethod
+    def get_sensor_families(sensor_list):
+        '''
+        get {uniqname: metric family} of exported metrics of given sensors
+        '''
+
+        families = {}
+
+        for sensor in sensor_list:
             if sensor.export_hidden:
                 continue
 
             for (name, metric_type, value, labels, labels_data,
                  prefix) in sensor.get_promexport_data():
-                if prefix is None:
-                    metric_name = f'{app_name}_{name}'
-                else:
-                    metric_name = f'{prefix}_{name}' if prefix else name
+                metric_name = CustomCollector.get_metric_name(name, prefix)
 
                 uniqname = f'{metric_name}_' + '_'.join(labels)
                 if uniqname not in families:
@@ -133,8 +276,75 @@ class CustomCollector():
 
                 x.add_metric(labels_data, value)
 
-        for family in sorted(families, key=str.lower):
-            yield families[family]
+        return families
+
+    def __update_export_index(self):
+        '''
+        group exported series of sensors by family uniqname
+        {uniqname: (metric_name, type, labels, [(sensor, attribute, label values)])}
+        the layout of series is given by config, so only new sensors are added
+        '''
+
+        epoch = self.sensors.journal.epoch
+        if self.export_index_epoch != epoch:
+            self.export_index = {}
+            self.export_index_len = 0
+            self.export_index_epoch = epoch
+
+        sensor_index = self.sensors.sensor_index
+        for sensor in sensor_index[self.export_index_len:]:
+            if sensor.export_hidden:
+                continue
+
+            for (name, metric_type, attr, labels, labels_data,
+                 prefix) in sensor.get_promexport_layout():
+                metric_name = self.get_metric_name(name, prefix)
+                uniqname = f'{metric_name}_' + '_'.join(labels)
+                if uniqname not in self.export_index:
+                    self.export_index[uniqname] = (metric_name, metric_type, labels, [])
+                self.export_index[uniqname][3].append((sensor, attr, labels_data))
+
+        self.export_index_len = len(sensor_index)
+
+    def stream_sensor_families(self):
+        '''
+        yield metric families of sensors one by one sorted by uniqname,
+        only one family is built at a time
+        '''
+
+        self.__update_export_index()
+
+        for uniqname in sorted(self.export_index, key=str.lower):
+            (metric_name, metric_type, labels, members) = self.export_index[uniqname]
+            x = None
+            for sensor, attr, labels_data in members:
+                value = getattr(sensor, attr)
+                if value is None:
+                    continue
+                if x is None:
+                    help_str = f"with labels: {labels}"
+                    if metric_type == COUNTER:
+                        x = CounterMetricFamily(metric_name, help_str, labels=labels)
+                    else:
+                        x = GaugeMetricFamily(metric_name, help_str, labels=labels)
+                x.add_metric(labels_data, value)
+
+            if x is not None:
+                yield x
 
 
-REGISTRY.register(CustomCollector(metrics, sensors))
+if pars.metrics_export == 'stream':
+    collector = CustomCollector(metrics,
+                                sensors,
+                                streaming=True,
+                                eval_cost_top=pars.eval_cost_top,
+                                inner_send_queues=send_queues)
+    exposition_cache = None
+else:
+    collector = CustomCollector(metrics,
+                                sensors,
+                                export_sensors=False,
+                                eval_cost_top=pars.eval_cost_top,
+                                inner_send_queues=send_queues)
+    exposition_cache = ExpositionCache(sensors, collector.get_sensor_families)
+REGISTRY.register(collector)
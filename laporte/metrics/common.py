@@ -46,3 +46,64 @@ socketio_duration_metric = {
     'suffix': 'seconds',
     'help_str': 'duration of Socket.IO event'
 }
+
+pipeline_stage_metric = {
+    'prefix': app_name,
+    'name': 'pipeline_stage',
+    'suffix': 'seconds',
+    'help_str': 'duration of a stage of sensor update pipeline'
+}
+
+pipeline_stage_buckets = [
+    .00001, .000025, .00005, .0001, .00025, .0005, .001, .0025, .005, .01, .025, .05, .1,
+    .25, .5, 1
+]
+
+sensor_eval_seconds_metric = {
+    'prefix': app_name,
+    'name': 'sensor_eval_seconds',
+    'suffix': 'total',
+    'help_str': 'total duration of eval code of a sensor'
+}
+
+sensor_evals_metric = {
+    'prefix': app_name,
+    'name': 'sensor_evals',
+    'suffix': 'total',
+    'help_str': 'number of evaluations of eval code of a sensor'
+}
+
+sio_queue_messages_metric = {
+    'prefix': app_name,
+    'name': 'sio_queue',
+    'suffix': 'messages',
+    'help_str': 'number of messages waiting in send queues of Socket.IO clients'
+}
+
+sio_queue_bytes_metric = {
+    'prefix': app_name,
+    'name': 'sio_queue',
+    'suffix': 'bytes',
+    'help_str': 'size of messages waiting in send queues of Socket.IO clients'
+}
+
+sio_queue_clients_metric = {
+    'prefix': app_name,
+    'name': 'sio_queued',
+    'suffix': 'clients',
+    'help_str': 'number of Socket.IO clients with messages waiting in send queues'
+}
+
+sio_queue_dropped_metric = {
+    'prefix': app_name,
+    'name': 'sio_queue_dropped_messages',
+    'suffix': 'total',
+    'help_str': 'number of messages dropped from full send queues of Socket.IO clients'
+}
+
+sio_queue_coalesced_metric = {
+    'prefix': app_name,
+    'name': 'sio_queue_coalesced_messages',
+    'suffix': 'total',
+    'help_str': 'number of messages merged in full send queues of Socket.IO clients'
+}
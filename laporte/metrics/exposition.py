@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+'''
+Cache of pre-serialized Prometheus exposition of sensor metrics
+'''
+
+from prometheus_client import generate_latest
+from prometheus_client.openmetrics import exposition as openmetrics
+
+TEXT = 'text'
+OPENMETRICS = 'openmetrics'
+OPENMETRICS_EOF = b'# EOF\n'
+
+GENERATORS = {TEXT: generate_latest, OPENMETRICS: openmetrics.generate_latest}
+
+
+class FamilyList():
+    '''a collector-like object yielding given metric families'''
+    def __init__(self, families):
+        self.families = families
+
+    def collect(self):
+        return self.families
+
+
+class ExpositionState():
+    '''serialized families of one exposition format'''
+    def __init__(self):
+        self.headers = {}  # uniqname: HELP and TYPE lines
+        self.samples = {}  # uniqname: {sensor: sample lines}
+        self.sensor_families = {}  # sensor: [uniqname]
+        self.pending = {}  # sensors to be serialized again (dict keys keep order)
+        self.generation = None
+        self.epoch = None
+        self.output = b''
+
+
+class ExpositionCache():
+    '''
+    Keep exposition of sensor metrics serialized per sensor.
+    Only sensors changed since the last scrape (as recorded by the change
+    journal) are serialized again and an unchanged state is served
+    from cached bytes.
+    '''
+    def __init__(self, sensors, get_families):
+        self.sensors = sensors
+        self.get_families = get_families
+        self.states = {fmt: ExpositionState() for fmt in GENERATORS}
+
+    @staticmethod
+    def __split(text):
+        '''split serialized family to (header lines, sample lines)'''
+
+        lines = text.splitlines(keepends=True)
+        header = ''.join(line for line in lines if line.startswith('#'))
+        samples = ''.join(line for line in lines if not line.startswith('#'))
+        return header, samples
+
+    @staticmethod
+    def __remove_sensor(state, sensor, uniqnames):
+        for uniqname in uniqnames:
+            family_samples = state.samples[uniqname]
+            family_samples.pop(sensor, None)
+            if not family_samples:
+                del state.samples[uniqname]
+                del state.headers[uniqname]
+
+    def __update_sensor(self, state, generator, sensor):
+        families = self.get_families([sensor])
+
+        for uniqname, family in families.items():
+            text = generator(FamilyList([family])).decode('utf-8')
+            if generator is openmetrics.generate_latest:
+                text = text[:-len(OPENMETRICS_EOF)]
+            header, samples = self.__split(text)
+
+            if uniqname not in state.headers:
+                state.headers[uniqname] = header
+                state.samples[uniqname] = {}
+            # replacing keeps position of the sensor in the family
+            state.samples[uniqname][sensor] = samples
+
+        left = [u for u in state.sensor_families.pop(sensor, []) if u not in families]
+        self.__remove_sensor(state, sensor, left)
+
+        if families:
+            state.sensor_families[sensor] = list(families)
+
+    def get(self, fmt=TEXT):
+        '''get serialized metrics of all sensors in given format'''
+
+        journal = self.sensors.journal
+        state = self.states[fmt]
+
+        if state.epoch == journal.epoch and state.generation == journal.generation:
+            return state.output
+
+        changed = journal.pop_export()
+        for other_state in self.states.values():
+            other_state.pending.update(changed)
+
+        generator = GENERATORS[fmt]
+        if state.epoch != journal.epoch:
+            # the set of sensors has been replaced (config reload)
+            new_state = ExpositionState()
+            for sensor in self.sensors.sensor_index:
+                self.__update_sensor(new_state, generator, sensor)
+            state = self.states[fmt] = new_state
+        else:
+            for sensor in state.pending:
+                self.__update_sensor(state, generator, sensor)
+
+        state.pending = {}
+        state.epoch = journal.epoch
+        state.generation = journal.generation
+        state.output = ''.join(state.headers[uniqname] +
+                               ''.join(state.samples[uniqname].values())
+                               for uniqname in sorted(state.headers, key=str.lower))
+        state.output = state.output.encode('utf-8')
+
+        return state.output
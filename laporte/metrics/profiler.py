@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+'''
+Sampling profiler of the gevent loop
+'''
+
+import logging
+import os
+import sys
+from time import perf_counter
+import greenlet
+import gevent
+from gevent.hub import Hub
+from gevent.monkey import get_original
+
+# native (not monkey patched) thread functions
+start_new_thread = get_original('_thread', 'start_new_thread')
+get_ident = get_original('_thread', 'get_ident')
+native_sleep = get_original('time', 'sleep')
+
+# create logger
+logging.getLogger(__name__).addHandler(logging.NullHandler())
+
+PROFILE_INTERVAL = 0.005
+PROFILE_MAX_SECONDS = 300
+BLOCKING_THRESHOLD = 0.1
+
+
+class SamplingProfiler():
+    '''
+    A native thread samples the stack of the greenlet running in the main thread
+    at a fixed interval, samples are counted as collapsed stacks
+    (root;...;leaf count - the input format of flamegraph tools).
+    Greenlet switches are traced to count them and to find greenlets blocking
+    the loop for longer than a threshold.
+    The tracer and the sampler are active only while profiling.
+    '''
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self.running = False
+        self.sampling = False
+        self.main_ident = None
+        self.prev_tracer = None
+        self.reset()
+
+    def reset(self, threshold=BLOCKING_THRESHOLD):
+        self.threshold = threshold
+        self.seconds = 0.0
+        self.stacks = {}  # collapsed stack: number of samples
+        self.samples = 0
+        self.switches = 0
+        self.blocking = []  # (greenlet name, duration, a stack sampled while blocking)
+        self.current = greenlet.getcurrent()
+        self.switch_t = perf_counter()
+        self.run_stack = None  # the last stack sampled during the current run
+
+    @staticmethod
+    def get_name(glet):
+        '''get a readable name of a greenlet'''
+
+        if isinstance(glet, Hub):
+            return 'hub'
+
+        name = getattr(glet, 'name', None) or type(glet).__name__
+        run = getattr(glet, '_run', None)
+        if run is not None:
+            name += f" [{getattr(run, '__qualname__', type(run).__name__)}]"
+        return name
+
+    def __trace(self, event, args):
+        '''greenlet tracer, called on every switch'''
+
+        if event in ('switch', 'throw'):
+            (origin, target) = args
+            now = perf_counter()
+            duration = now - self.switch_t
+            if duration >= self.threshold and not isinstance(origin, Hub):
+                self.blocking.append((self.get_name(origin), duration, self.run_stack))
+            self.switches += 1
+            self.current = target
+            self.switch_t = now
+            self.run_stack = None
+
+        if self.prev_tracer is not None:
+            self.prev_tracer(event, args)
+
+    def __sample(self):
+        frame = sys._current_frames().get(self.main_ident)  # pylint: disable=protected-access
+        if frame is None:
+            return
+
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(
+                f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+            frame = frame.f_back
+        names.append(self.get_name(self.current))
+        names.reverse()
+
+        stack = ';'.join(names)
+        self.stacks[stack] = self.stacks.get(stack, 0) + 1
+        self.samples += 1
+        self.run_stack = stack
+
+    def __run_sampler(self, seconds):
+        '''loop of the native sampling thread'''
+
+        try:
+            end_t = perf_counter() + seconds
+            while self.running and perf_counter() < end_t:
+                self.__sample()
+                native_sleep(self.interval)
+        finally:
+            self.sampling = False
+
+    def profile(self, seconds, threshold=BLOCKING_THRESHOLD):
+        '''
+        profile the loop for given seconds (the calling greenlet sleeps meanwhile)
+        raise RuntimeError if a profile is already running
+        '''
+
+        if self.running:
+            raise RuntimeError("profiler is already running")
+
+        self.reset(threshold)
+        self.main_ident = get_ident()
+        self.running = True
+        self.sampling = True
+        self.prev_tracer = greenlet.settrace(self.__trace)
+        start_t = perf_counter()
+        logging.info("profiler started for %ss", seconds)
+
+        try:
+            start_new_thread(self.__run_sampler, (seconds, ))
+            gevent.sleep(seconds)
+        finally:
+            self.running = False
+            greenlet.settrace(self.prev_tracer)
+            self.prev_tracer = None
+            while self.sampling:
+                gevent.sleep(self.interval)
+            self.seconds = perf_counter() - start_t
+
+        logging.info("profiler finished: %d samples, %d greenlet switches", self.samples,
+                     self.switches)
+
+    def get_collapsed(self):
+        '''get collapsed stacks (one "root;...;leaf count" per line)'''
+
+        return ''.join(f'{stack} {count}\n' for stack, count in sorted(
+            self.stacks.items(), key=lambda item: item[1], reverse=True))
+
+    def get_report(self):
+        '''get summary of the last profile as a dict'''
+
+        return {
+            'seconds': self.seconds,
+            'interval': self.interval,
+            'samples': self.samples,
+            'switches': self.switches,
+            'blocking_threshold': self.threshold,
+            'blocking': [{
+                'greenlet': name,
+                'duration': duration,
+                'stack': stack
+            } for (name, duration, stack) in self.blocking],
+            'stacks': self.stacks
+        }
+
+
+profiler = SamplingProfiler()
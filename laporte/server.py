@@ -7,7 +7,9 @@ a WSGI server making up the Laport http server
 from gevent import monkey
 monkey.patch_all()  # nopep8
 import logging
+import signal
 import sys
+import gevent
 from geventwebsocket.handler import WebSocketHandler
 from gevent.pywsgi import WSGIServer, LoggingLogAdapter
 
@@ -16,10 +18,12 @@ from laporte.app import app
 from laporte.logger import logger
 from laporte.core import sensors, scheduler
 from laporte.api import api_bp
+from laporte.api.ingest import ingest_bp
 from laporte.web import web_bp
 from laporte.metrics.collector import metrics_bp
 
 app.register_blueprint(api_bp)
+app.register_blueprint(ingest_bp)
 app.register_blueprint(web_bp)
 app.register_blueprint(metrics_bp)
 
@@ -29,10 +33,12 @@ def run_server():
 
     scheduler.start()
     try:
-        sensors.load_config(pars)
+        # state saved before the last shutdown is restored before serving
+        sensors.load_config(pars, sensors.load_state())
     except sensors.ConfigException as exc:
         logger.error(exc)
         sys.exit(1)
+    sensors.save_state()
 
     logger.info("HTTP server `listen %s:%s", pars.listen_addr, pars.listen_port)
     dlog = LoggingLogAdapter(logger, level=logging.DEBUG)
@@ -42,4 +48,8 @@ def run_server():
                              log=dlog,
                              error_log=errlog,
                              handler_class=WebSocketHandler)
-    http_server.serve_forever()
+    gevent.signal_handler(signal.SIGTERM, http_server.stop)
+    try:
+        http_server.serve_forever()
+    finally:
+        sensors.save_state()
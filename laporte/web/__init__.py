@@ -2,10 +2,12 @@
 Flask blueprint and resources of Laporte web interface
 '''
 
-from flask import Blueprint, render_template
+from flask import Blueprint, Response, render_template, request, jsonify, abort
+from laporte.argparser import pars
 from laporte.version import __version__, get_runtime_info
 from laporte.metrics import metrics
 from laporte.metrics.common import http_duration_metric
+from laporte.metrics.profiler import profiler, PROFILE_MAX_SECONDS, BLOCKING_THRESHOLD
 from laporte.app import sio
 from laporte.api import api
 from laporte.core import sensors
@@ -81,6 +83,43 @@ def status_log():
     return render_template('log.html', async_mode=sio.async_mode)
 
 
+@web_bp.route('/status/profile')
+@metrics.func_measure(**http_duration_metric,
+                      labels={
+                          'method': 'get',
+                          'location': '/status/profile'
+                      })
+def status_profile():
+    '''
+    a page of the sampling profiler, or with ?seconds=N a profile of the loop
+    as collapsed stacks (format=json for a summary with greenlet switches
+    and blocking events)
+    '''
+
+    if 'seconds' not in request.args:
+        return render_template('profile.html',
+                               enabled=pars.profiler,
+                               max_seconds=PROFILE_MAX_SECONDS,
+                               threshold=BLOCKING_THRESHOLD)
+
+    if not pars.profiler:
+        abort(404, "profiler is disabled (enable with --profiler)")
+
+    seconds = request.args.get('seconds', type=float)
+    threshold = request.args.get('threshold', BLOCKING_THRESHOLD, type=float)
+    if seconds is None or not 0 < seconds <= PROFILE_MAX_SECONDS or threshold <= 0:
+        abort(400, f"seconds must be in (0, {PROFILE_MAX_SECONDS}], threshold > 0")
+
+    try:
+        profiler.profile(seconds, threshold)
+    except RuntimeError as exc:
+        abort(409, str(exc))
+
+    if request.args.get('format') == 'json':
+        return jsonify(profiler.get_report())
+    return Response(profiler.get_collapsed(), mimetype='text/plain')
+
+
 @web_bp.route('/doc')
 @metrics.func_measure(**http_duration_metric,
                       labels={
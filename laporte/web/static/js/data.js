@@ -55,10 +55,20 @@ function do_metric(metric, sensor_label, value, tnow) {
     }
 }
 
+// position in the event stream, sent upon reconnection to get only missed events
+var position = {};
+
 function fill_metrics(msg) {
-    const event_data = JSON.parse(msg).data;
+    const event = (typeof msg === "string") ? JSON.parse(msg) : msg;
+    const event_data = event.data;
     const tnow = new Date();
 
+    if ("stream" in event) {
+        position = { stream: event.stream, since: event.seq };
+    } else if ("seq" in event && "stream" in position) {
+        position.since = event.seq;
+    }
+
     for (var node_id in event_data) {
         if (event_data.hasOwnProperty(node_id)) {
             for (var sensor_id in event_data[node_id]) {
@@ -80,7 +90,11 @@ $(document).ready(function () {
     // Connect to the Socket.IO server.
     const namespace = "/events";
     const sio_url = `${location.protocol}//${document.domain}:${location.port}${namespace}`;
-    var socket = io.connect(sio_url);
+    var socket = io.connect(sio_url, {
+        auth: function (cb) {
+            cb(position);
+        }
+    });
 
     // Event handlers:
     socket.on('connect', function () {
@@ -101,6 +115,11 @@ $(document).ready(function () {
     socket.on('event_response', function (msg) {
         fill_metrics(msg);
     });
+
+    // Event handler: server sent events missed while disconnected.
+    socket.on('resume_response', function (msg) {
+        JSON.parse(msg).forEach(fill_metrics);
+    });
 });
 
 /* jshint unused: false */
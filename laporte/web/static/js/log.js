@@ -78,10 +78,14 @@ $(document).ready(function () {
         scrollToBottomInstant();
     });
 
-    // Event handler: server sent a realtime log
+    // Event handler: server sent realtime logs (a batch of logs as a list)
     socket.on('log_response', function (msg) {
-        var log = JSON.parse(msg);
-        print_log(log);
+        var logs = JSON.parse(msg);
+        if (Array.isArray(logs)) {
+            print_batch_log(logs);
+        } else {
+            print_log(logs);
+        }
 
         if (followLogs()) {
             scrollToBottomAnimate();
@@ -0,0 +1,73 @@
+/* global 
+    htmlEncode
+*/
+
+const MAX_STACKS = 50;
+
+function render_stack(stack) {
+    if (!stack) {
+        return "";
+    }
+    return stack.split(";").map(htmlEncode).join("<br/>");
+}
+
+function render_profile(report) {
+    $("#summary").html(
+        `${report.samples} samples in ${Math.round(report.seconds * 10) / 10}s, ` +
+        `${report.switches} greenlet switches, ` +
+        `${report.blocking.length} blocking events over ${report.blocking_threshold}s`
+    );
+
+    var blocking = "";
+    report.blocking.forEach(event => {
+        blocking += `
+        <tr>
+            <td>${Math.round(event.duration * 1000)}ms</td>
+            <td>${htmlEncode(event.greenlet)}</td>
+            <td class="text-monospace small">${render_stack(event.stack)}</td>
+        </tr>
+        `;
+    });
+    $("#blocking").html(blocking);
+
+    var stacks = "";
+    Object.entries(report.stacks)
+        .sort((first, second) => second[1] - first[1])
+        .slice(0, MAX_STACKS)
+        .forEach(([stack, count]) => {
+            stacks += `
+            <tr>
+                <td>${count}</td>
+                <td class="text-monospace small">${render_stack(stack)}</td>
+            </tr>
+            `;
+        });
+    $("#stacks").html(stacks);
+}
+
+function profile_url(format) {
+    const seconds = $("#seconds").val();
+    const threshold = $("#threshold").val();
+    return `${location.pathname}?seconds=${seconds}&threshold=${threshold}&format=${format}`;
+}
+
+$(document).ready(function () {
+    $("#collapsed").on("mouseenter focus", function () {
+        $(this).attr("href", profile_url("collapsed"));
+    });
+
+    $("#profile-form").on("submit", function (event) {
+        event.preventDefault();
+        $("#start").prop("disabled", true);
+        $("#summary").html("profiling...");
+
+        $.getJSON(profile_url("json"))
+            .done(render_profile)
+            .fail(function (xhr) {
+                $("#summary").html(`error ${xhr.status}: ${htmlEncode(xhr.statusText)}`);
+            })
+            .always(function () {
+                $("#start").prop("disabled", false);
+            });
+    });
+});